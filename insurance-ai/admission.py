@@ -0,0 +1,120 @@
+"""
+Admission Control
+Bounds how many /recommend requests wait on the LLM at once.
+
+Up to `limit` requests run the AI pipeline concurrently; up to `max_queue`
+more wait (for at most `queue_timeout` seconds) for a slot. Anything beyond
+that is shed — the caller serves it instantly from the deterministic
+rule-based path instead of growing an unbounded queue.
+
+With adaptive mode on, the concurrency limit follows observed LLM latency
+(AIMD): it grows by one while latency stays under target and the limit is
+saturated, and shrinks multiplicatively when latency goes above target.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+ADMISSION_QUEUE_TIMEOUT_MS = int(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+ADMISSION_ADAPTIVE = os.getenv("ADMISSION_ADAPTIVE", "0") == "1"
+ADMISSION_TARGET_LATENCY = float(os.getenv("ADMISSION_TARGET_LATENCY", "5"))   # seconds
+ADMISSION_MIN_CONCURRENCY = int(os.getenv("ADMISSION_MIN_CONCURRENCY", "4"))
+ADMISSION_CONCURRENCY_CAP = int(os.getenv("ADMISSION_CONCURRENCY_CAP", "256"))
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        adaptive: bool = False,
+        target_latency: float = ADMISSION_TARGET_LATENCY,
+        min_limit: int = ADMISSION_MIN_CONCURRENCY,
+        max_limit: int = ADMISSION_CONCURRENCY_CAP,
+        latency_source: Optional[Callable[[], float]] = None,
+    ):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, limit)
+        self.latency_source = latency_source
+
+        self.active = 0
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+        self.counters = {"admitted": 0, "queued": 0, "shed": 0}
+
+    async def acquire(self) -> bool:
+        """Take a slot. Returns False if the request should be shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.counters["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.counters["shed"] += 1
+            return False
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(fut, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self.release()   # slot was handed over just as we gave up
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.counters["shed"] += 1
+            return False
+        self.counters["admitted"] += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        if self.adaptive:
+            self._adapt()
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.active < self.limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.active += 1
+                fut.set_result(True)
+
+    def _adapt(self):
+        latency = self.latency_source() if self.latency_source else 0.0
+        if not latency:
+            return
+        now = time.monotonic()
+        if latency > self.target_latency:
+            # At most one multiplicative decrease per target-latency window
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.min_limit, int(self.limit * 0.8))
+                self._last_decrease = now
+        elif self.active + 1 >= self.limit or self._waiters:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued_now": len(self._waiters),
+            "max_queue": self.max_queue,
+            "adaptive": self.adaptive,
+            **self.counters,
+        }
@@ -8,23 +8,90 @@ Two-stage pipeline:
 Uses Groq API (Llama 3.3 70B) — 14,400 free requests/day, sub-second inference.
 """
 
+import hashlib
 import json
 import os
 import re
+import time
 import asyncio
-from typing import Optional
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Literal, Optional, get_args
 
-from groq import Groq
 from dotenv import load_dotenv
 
+from circuit_breaker import CircuitOpenError, llm_breaker
+from catalog_store import CatalogSnapshot, catalog_store
+from distilled_ranker import AGREEMENT_TOP_K, DISTILLED_MIN_CONFIDENCE, distilled_ranker, rank_log
+from insurer_catalog import plan_version
+from llm_cache import llm_cache, make_key, profile_fingerprint
+from metrics import fallbacks, llm_call_seconds, llm_calls, span
+from ranking_engine import CompiledCatalog, score_profiles, top_n_indices
+from quota_scheduler import QuotaExhausted, llm_scheduler
+from singleflight import llm_inflight
+from token_meter import estimate_tokens, llm_tokens
+
+if TYPE_CHECKING:
+    import httpx
+    from groq import AsyncGroq
+
 load_dotenv()
-_client = Groq(api_key=os.getenv("GROQ_API_KEY", ""))
 
 # Models
 TEXT_MODEL = "llama-3.3-70b-versatile"
 
-# Rate-limit: generous on Groq free tier but still be polite
-_RATE_LIMIT_DELAY = 2
+# HTTP client: one pooled connection set shared by every in-flight request.
+# Opened by the startup warm-up (see main.py) or on first use, and reused
+# until shutdown. groq/httpx are imported only then, keeping cold start short.
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "20"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "200"))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", "50"))
+
+_http_client: Optional["httpx.AsyncClient"] = None
+_client: Optional["AsyncGroq"] = None
+
+# Per-request time budget for the whole pipeline (0 = no deadline).
+# Node calls /recommend with a 30s abort, so stay well inside it.
+RECOMMEND_DEADLINE_MS = int(os.getenv("RECOMMEND_DEADLINE_MS", "15000"))
+# Don't start an LLM call with less than this much budget left
+MIN_CALL_BUDGET = float(os.getenv("MIN_CALL_BUDGET", "0.5"))
+
+# Catalog snapshot pinned for the request currently being served, so a hot
+# reload mid-request cannot mix plan data or cache-key versions
+_catalog: ContextVar[Optional[CatalogSnapshot]] = ContextVar("catalog_snapshot", default=None)
+
+# Absolute time.monotonic() deadline of the request currently being served
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+# id() of the profiles whose ranking or an explanation came from the fallback
+# path, collected by get_recommendations_batch
+_degraded: ContextVar[Optional[set]] = ContextVar("degraded_profiles", default=None)
+
+# Stage-2 mode: "individual" (1 call per plan) or "batch" (1 call for all top plans)
+ExplainMode = Literal["individual", "batch"]
+EXPLAIN_MODES = get_args(ExplainMode)
+
+
+def explain_mode_setting(name: str, default: str) -> str:
+    """Explain mode from env var `name`; a typo fails at import instead of silently running another mode."""
+    mode = os.getenv(name, default)
+    if mode not in EXPLAIN_MODES:
+        raise ValueError(f"{name}={mode!r} (expected one of {', '.join(EXPLAIN_MODES)})")
+    return mode
+
+
+EXPLAIN_MODE = explain_mode_setting("EXPLAIN_MODE", "individual")
+
+# Stage-1 prompt: plan encoding ("table" or "lines") and token budget. Only
+# the RANK_TOP_K plans the rule-based scorer rates highest (and whose rows
+# fit RANK_PROMPT_TOKEN_BUDGET) are sent to the LLM; 0 disables either limit.
+RANK_PROMPT_FORMAT = os.getenv("RANK_PROMPT_FORMAT", "table")
+RANK_TOP_K = int(os.getenv("RANK_TOP_K", "6"))
+RANK_PROMPT_TOKEN_BUDGET = int(os.getenv("RANK_PROMPT_TOKEN_BUDGET", "0"))
+
+# Batch endpoint: workers ranked per multi-profile prompt, groups processed at once
+RANK_BATCH_SIZE = int(os.getenv("RANK_BATCH_SIZE", "8"))
+RECOMMEND_BATCH_CONCURRENCY = int(os.getenv("RECOMMEND_BATCH_CONCURRENCY", "8"))
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -46,9 +113,95 @@ def _extract_json(text: str):
 
 
 
-def _call_groq(prompt: str) -> str:
-    """Call Groq LLM and return the response text."""
-    chat_completion = _client.chat.completions.create(
+# ── Client lifecycle ──────────────────────────────────────────────────────────
+
+async def init_client() -> "AsyncGroq":
+    """Open the shared pooled HTTP connection and async Groq client."""
+    global _http_client, _client
+    if _client is None:
+        import httpx
+        from groq import AsyncGroq
+
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+        )
+        _client = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY", ""),
+            http_client=_http_client,
+            max_retries=0,
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared client (called on app shutdown)."""
+    global _http_client, _client
+    if _client is not None:
+        await _client.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _client = None
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request's time budget cannot fit another LLM call."""
+
+
+def _remaining_budget() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+async def _call_groq(
+    prompt: str,
+    timeout: Optional[float] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    stage: str = "other",
+) -> str:
+    """
+    Call Groq LLM and return the response text.
+    Fails fast (CircuitOpenError / DeadlineExceeded / QuotaExhausted) instead
+    of waiting on a provider that is down, a request that has run out of time
+    budget, or a priority class whose share of the daily quota is spent.
+    With `on_token`, the completion is streamed and every text delta is
+    passed to it as it arrives. Token usage is counted under `stage`.
+    """
+    client = _client or await init_client()
+    from groq import APITimeoutError
+
+    if not llm_breaker.allow():
+        llm_calls.inc((stage, "circuit_open"))
+        raise CircuitOpenError("LLM circuit breaker is open")
+
+    try:
+        remaining = _remaining_budget()
+        if remaining is not None and remaining < MIN_CALL_BUDGET:
+            raise DeadlineExceeded(f"{remaining:.2f}s budget left")
+        # Process-wide quota: every request in this worker draws from one
+        # bucket, queued by the priority class of the request
+        with span("quota_wait"):
+            await asyncio.wait_for(llm_scheduler.acquire(), timeout=remaining)
+    except (DeadlineExceeded, asyncio.TimeoutError) as e:
+        llm_breaker.release_probe()
+        llm_calls.inc((stage, "deadline"))
+        raise DeadlineExceeded("no time budget left for LLM call") from e
+    except BaseException as e:
+        llm_breaker.release_probe()
+        llm_calls.inc((stage, "quota" if isinstance(e, QuotaExhausted) else "cancelled"))
+        raise
+
+    call_timeout = timeout if timeout is not None else GROQ_TIMEOUT
+    remaining = _remaining_budget()
+    cut_by_deadline = remaining is not None and remaining < call_timeout
+    if cut_by_deadline:
+        call_timeout = max(remaining, 0.001)
+
+    request = dict(
         messages=[
             {"role": "system", "content": "You are a helpful AI insurance advisor. Always respond with valid JSON only, no extra text."},
             {"role": "user", "content": prompt},
@@ -56,8 +209,59 @@ def _call_groq(prompt: str) -> str:
         model=TEXT_MODEL,
         temperature=0.3,
         max_tokens=2048,
+        timeout=call_timeout,
     )
-    return chat_completion.choices[0].message.content
+
+    usage = None
+
+    async def _stream() -> str:
+        nonlocal usage
+        parts = []
+        async for chunk in await client.chat.completions.create(stream=True, **request):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                on_token(delta)
+            # Groq reports usage on the final chunk under x_groq
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+        return "".join(parts)
+
+    start = time.monotonic()
+    try:
+        if on_token is None:
+            chat_completion = await client.chat.completions.create(**request)
+            text = chat_completion.choices[0].message.content
+            usage = getattr(chat_completion, "usage", None)
+        else:
+            # The SDK timeout is per read; bound the whole stream as well
+            text = await asyncio.wait_for(_stream(), timeout=call_timeout)
+    except (APITimeoutError, asyncio.TimeoutError) as e:
+        if cut_by_deadline:
+            # Our own budget ran out — not evidence that the provider is unhealthy
+            llm_breaker.release_probe()
+            llm_calls.inc((stage, "deadline"))
+            raise DeadlineExceeded("request deadline reached during LLM call") from e
+        llm_breaker.record_failure()
+        llm_calls.inc((stage, "timeout"))
+        raise
+    except asyncio.CancelledError:
+        llm_breaker.release_probe()
+        llm_calls.inc((stage, "cancelled"))
+        raise
+    except Exception:
+        llm_breaker.record_failure()
+        llm_calls.inc((stage, "error"))
+        raise
+    elapsed = time.monotonic() - start
+    llm_breaker.record_success(elapsed)
+    llm_calls.inc((stage, "ok"))
+    llm_call_seconds.observe((stage,), elapsed)
+    if usage is not None:
+        llm_tokens.record(stage, usage.prompt_tokens, usage.completion_tokens)
+    else:
+        prompt_text = "".join(m["content"] for m in request["messages"])
+        llm_tokens.record(stage, estimate_tokens(prompt_text), estimate_tokens(text or ""), estimated=True)
+    return text
 
 
 def _worker_summary(profile: dict) -> str:
@@ -79,15 +283,125 @@ def _worker_summary(profile: dict) -> str:
 
 # ── Stage 1: Rank plans (1 API call for all plans) ───────────────────────────
 
-async def rank_plans(profile: dict, plans: list) -> list[dict]:
+def _plan_version(catalog: CatalogSnapshot, plan: dict) -> str:
+    return catalog.plan_versions.get(plan["plan_id"]) or plan_version(plan)
+
+
+def _plan_set_key(catalog: CatalogSnapshot, plans: list) -> str:
+    """Hash of the exact plan contents ranked — unaffected by changes to other plans."""
+    entries = sorted(f"{p['plan_id']}@{_plan_version(catalog, p)}" for p in plans)
+    return hashlib.sha256(",".join(entries).encode()).hexdigest()[:12]
+
+
+def _snapshot() -> CatalogSnapshot:
+    return _catalog.get() or catalog_store.snapshot
+
+
+def _clean_ranking(rankings) -> Optional[list]:
+    """
+    The LLM ranking with integer match scores, or None if it is malformed.
+    Runs before a ranking is logged, merged or cached, so a reply such as
+    "match_score": "85" cannot reach the cache as a string.
+    """
+    if not isinstance(rankings, list):
+        return None
+    cleaned = []
+    for r in rankings:
+        if not isinstance(r, dict) or "plan_id" not in r or isinstance(r.get("match_score"), bool):
+            return None
+        try:
+            score = int(r["match_score"])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            return None
+        cleaned.append({**r, "match_score": score, "why_it_fits": str(r.get("why_it_fits") or "General match")})
+    return cleaned
+
+
+def _distilled_scores(profile: dict, plans: list, catalog: CatalogSnapshot, top_n: int = AGREEMENT_TOP_K):
+    """
+    (scores, confident) from the distilled ranker, or None when it is not
+    loaded. Confidence is judged on the order of the top_n plans the caller
+    will show. Unconfident calls are counted as LLM fallbacks.
+    """
+    if distilled_ranker is None or not plans:
+        return None
+    keys = [(p["plan_id"], _plan_version(catalog, p)) for p in plans]
+    scores, confidence = distilled_ranker.score(profile, plans, keys, top_n)
+    confident = confidence >= DISTILLED_MIN_CONFIDENCE
+    distilled_ranker.counters["served_local" if confident else "llm_fallbacks"] += 1
+    return scores, confident
+
+
+async def _learn_from(profile: dict, plans: list, rankings: list, local=None):
+    """Log an LLM ranking for distillation and compare it with the local prediction."""
+    if local is not None:
+        by_id = {r["plan_id"]: r["match_score"] for r in rankings}
+        llm_scores = [by_id.get(p["plan_id"]) for p in plans]
+        if all(isinstance(s, (int, float)) for s in llm_scores):
+            distilled_ranker.record_comparison(local[0], llm_scores)
+    if rank_log is not None:
+        try:
+            await asyncio.to_thread(rank_log.record, profile, plans, rankings)
+        except Exception as e:
+            print(f"Warning: ranking log write failed: {e}")
+
+
+def _rank_candidates(profiles: list[dict], plans: list, catalog: CatalogSnapshot) -> list:
+    """
+    Plans worth an LLM score: for each worker, the plans the rule-based scorer
+    rates highest, up to RANK_TOP_K and RANK_PROMPT_TOKEN_BUDGET (at least one).
+    Catalog order is kept.
+    """
+    limit = RANK_TOP_K if RANK_TOP_K > 0 else len(plans)
+    if limit >= len(plans) and RANK_PROMPT_TOKEN_BUDGET <= 0:
+        return plans
+    compiled, positions = _compiled_for(plans, catalog)
+    keep = set()
+    for row in score_profiles(compiled, profiles, positions):
+        used = 0
+        for taken, j in enumerate(sorted(range(len(plans)), key=lambda j: -row[j])):
+            tokens = catalog.fragments.rank_tokens(plans[j], RANK_PROMPT_FORMAT)
+            if taken and (taken >= limit or (RANK_PROMPT_TOKEN_BUDGET > 0 and used + tokens > RANK_PROMPT_TOKEN_BUDGET)):
+                break
+            keep.add(j)
+            used += tokens
+    return [p for j, p in enumerate(plans) if j in keep]
+
+
+def _with_unsent(profile: dict, rankings: list, plans: list, sent: list) -> list[dict]:
+    """Append rule-based entries for plans that were filtered out, below every LLM score."""
+    if len(sent) == len(plans):
+        return rankings
+    sent_ids = {p["plan_id"] for p in sent}
+    floor = min((r["match_score"] for r in rankings), default=100)
+    tail = _rule_based_ranking(profile, [p for p in plans if p["plan_id"] not in sent_ids])
+    for r in tail:
+        r["match_score"] = min(r["match_score"], max(floor - 1, 0))
+    return rankings + tail
+
+
+def _sent_scores(local, plans: list, sent: list):
+    """Restrict a distilled prediction over `plans` to the `sent` subset."""
+    if local is None or len(sent) == len(plans):
+        return local
+    index = {p["plan_id"]: j for j, p in enumerate(plans)}
+    return local[0][[index[p["plan_id"]] for p in sent]], local[1]
+
+
+async def rank_plans(profile: dict, plans: list, top_n: int = AGREEMENT_TOP_K) -> list[dict]:
+    catalog = _snapshot()
+    cache_key = make_key("rank", profile, _plan_set_key(catalog, plans))
+    cached = await llm_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
+    local = _distilled_scores(profile, plans, catalog, top_n)
+    if local is not None and local[1]:
+        return _rankings_from_scores(profile, plans, local[0])
+
+    sent = _rank_candidates([profile], plans, catalog)
     worker_text = _worker_summary(profile)
-    plans_text = "\n".join(
-        f"- plan_id: {p['plan_id']} | name: {p['plan_name']} | "
-        f"category: {p['category']} | targets: {p['target_workers']} | "
-        f"per_day: ₹{p['premium']['per_day']} | coverage: ₹{p['coverage_amount']:,} | "
-        f"best_for: {p.get('best_for','')}"
-        for p in plans
-    )
+    plans_text = catalog.fragments.rank_block(sent, RANK_PROMPT_FORMAT)
 
     prompt = f"""You are an AI insurance advisor for an Indian gig worker platform.
 
@@ -108,47 +422,142 @@ Respond ONLY with a valid JSON array (no extra text):
   }}
 ]"""
 
-    try:
-        text = _call_groq(prompt)
-        rankings = _extract_json(text)
-        assert all("plan_id" in r and "match_score" in r for r in rankings)
+    async def _rank():
+        text = await _call_groq(prompt, stage="rank")
+        rankings = _clean_ranking(_extract_json(text))
+        if rankings is None:
+            raise ValueError("malformed ranking")
+        await _learn_from(profile, sent, rankings, _sent_scores(local, plans, sent))
+        rankings = _with_unsent(profile, rankings, plans, sent)
+        await llm_cache.aset(cache_key, rankings)
         return rankings
+
+    try:
+        # Concurrent identical requests share one in-flight LLM call
+        return await llm_inflight.do(cache_key, _rank)
     except Exception as e:
         print(f"Groq ranking failed ({e}), using rule-based fallback")
+        fallbacks.inc(("rank_error",))
+        _mark_degraded(profile)
         return _rule_based_ranking(profile, plans)
 
 
+async def rank_plans_multi(profiles: list[dict], plans: list, top_ns: Optional[list] = None) -> list[list[dict]]:
+    """
+    Rank the same plan set for several workers with ONE prompt. The LLM
+    returns a JSON object keyed by worker label; each valid entry is cached
+    under that worker's normal rank key. Workers already cached are not sent,
+    and entries that come back missing or malformed go through rank_plans.
+    top_ns[i] is how many of the plans profiles[i] will be shown.
+    """
+    top_ns = top_ns or [AGREEMENT_TOP_K] * len(profiles)
+    catalog = _snapshot()
+    set_key = _plan_set_key(catalog, plans)
+    keys = [make_key("rank", p, set_key) for p in profiles]
+    results = await llm_cache.aget_many(keys)
+    local = {}
+    for i, r in enumerate(results):
+        if r is None and (scores := _distilled_scores(profiles[i], plans, catalog, top_ns[i])) is not None:
+            if scores[1]:
+                results[i] = _rankings_from_scores(profiles[i], plans, scores[0])
+            else:
+                local[i] = scores
+    pending = [i for i, r in enumerate(results) if r is None]
+
+    if len(pending) > 1:
+        workers_text = "\n".join(f"Worker W{n}:\n{_worker_summary(profiles[i])}" for n, i in enumerate(pending, start=1))
+        sent = _rank_candidates([profiles[i] for i in pending], plans, catalog)
+        plans_text = catalog.fragments.rank_block(sent, RANK_PROMPT_FORMAT)
+        prompt = f"""You are an AI insurance advisor for an Indian gig worker platform.
+
+{workers_text}
+Available insurance plans:
+{plans_text}
+
+For EACH worker, score EACH plan from 0 to 100 based on how well it matches that specific worker.
+Consider: employment type match, affordability (income vs premium), coverage needs, risk level.
+
+Respond ONLY with a valid JSON object keyed by worker label (no extra text):
+{{
+  "W1": [
+    {{
+      "plan_id": "PLAN_ID",
+      "match_score": <integer 0-100>,
+      "why_it_fits": "<one sentence, max 15 words, personalised>"
+    }}
+  ]
+}}"""
+        batch_key = "rank-multi:" + hashlib.sha256("|".join(keys[i] for i in pending).encode()).hexdigest()[:16]
+        try:
+            data = _extract_json(await llm_inflight.do(batch_key, lambda: _call_groq(prompt, stage="rank_multi")))
+        except Exception as e:
+            print(f"Groq multi-profile ranking failed ({e}), ranking workers individually")
+            data = {}
+        for n, i in enumerate(pending, start=1):
+            rankings = _clean_ranking(data.get(f"W{n}")) if isinstance(data, dict) else None
+            if rankings is not None:
+                await _learn_from(profiles[i], sent, rankings, _sent_scores(local.get(i), plans, sent))
+                results[i] = _with_unsent(profiles[i], rankings, plans, sent)
+                await llm_cache.aset(keys[i], results[i])
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    for i, rankings in zip(missing, await asyncio.gather(*(rank_plans(profiles[i], plans, top_ns[i]) for i in missing))):
+        results[i] = rankings
+    return results
+
+
+def _compiled_for(plans: list, catalog: Optional[CatalogSnapshot] = None):
+    """Columnar catalog + column positions for `plans` (compiles ad-hoc lists on the fly)."""
+    compiled = (catalog or _snapshot()).compiled
+    positions = compiled.positions(plans)
+    if positions is not None:
+        return compiled, positions
+    return CompiledCatalog(plans), None
+
+
 def _rule_based_ranking(profile: dict, plans: list) -> list[dict]:
+    compiled, positions = _compiled_for(plans)
+    return _rankings_from_scores(profile, plans, score_profiles(compiled, [profile], positions)[0])
+
+
+def _rankings_from_scores(profile: dict, plans: list, scores) -> list[dict]:
     emp = profile.get("employment_type", "delivery")
-    income = profile.get("avg_monthly_income", 15000)
     risk = profile.get("risk_classification", "MEDIUM")
+    why = f"Good match for {emp} workers with {risk.lower()} risk profile."
+    return [
+        {"plan_id": p["plan_id"], "match_score": int(round(float(score))), "why_it_fits": why}
+        for p, score in zip(plans, scores)
+    ]
 
-    results = []
-    for p in plans:
-        score = 50
-        if emp in p.get("target_workers", []):
-            score += 20
-        daily = p["premium"]["per_day"]
-        daily_income = income / 30
-        if daily / daily_income < 0.002:
-            score += 15
-        elif daily / daily_income < 0.004:
-            score += 8
-        if risk == "HIGH" and p["coverage_amount"] >= 300000:
-            score += 10
-        elif risk == "LOW" and p["premium"]["per_day"] <= 20:
-            score += 10
-        results.append({
-            "plan_id": p["plan_id"],
-            "match_score": min(score, 99),
-            "why_it_fits": f"Good match for {emp} workers with {risk.lower()} risk profile.",
-        })
-    return results
 
+# ── Stage 2: Explain top plans (1 API call each, concurrent) ─────────────────
 
-# ── Stage 2: Explain top plans (1 API call each, sequential) ─────────────────
+_EXPLANATION_FIELDS = {
+    "plain_explanation": str,
+    "simple_what_covered": list,
+    "simple_what_not_covered": list,
+    "simple_how_to_claim": str,
+    "bottom_line": str,
+    "affordability_note": str,
+}
+
+
+def _is_valid_explanation(explanation) -> bool:
+    return isinstance(explanation, dict) and all(
+        isinstance(explanation.get(k), t) for k, t in _EXPLANATION_FIELDS.items()
+    )
+
+
+async def explain_plan(
+    profile: dict, plan: dict, match_score: int, why_it_fits: str,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> dict:
+    catalog = _snapshot()
+    cache_key = make_key("explain", profile, _plan_version(catalog, plan), plan["plan_id"])
+    cached = await llm_cache.aget(cache_key)
+    if cached is not None:
+        return cached
 
-async def explain_plan(profile: dict, plan: dict, match_score: int, why_it_fits: str) -> dict:
     worker_text = _worker_summary(profile)
     emp = profile.get("employment_type", "delivery")
 
@@ -158,13 +567,7 @@ Use simple, everyday language. Avoid jargon. Imagine explaining to a friend who
 {worker_text}
 
 Plan Details:
-- Name: {plan['plan_name']} by {plan['provider']}
-- Daily Premium: ₹{plan['premium']['per_day']}
-- Coverage: ₹{plan['coverage_amount']:,}
-- What it covers: {', '.join(plan['inclusions'][:4])}
-- What it does NOT cover: {', '.join(plan['exclusions'][:3])}
-- How to claim: {plan['claim_process']}
-- Best for: {plan.get('best_for', '')}
+{catalog.fragments.detail(plan)}
 
 Write a personalised explanation tailored for a {emp} worker. Be warm, practical, and clear.
 
@@ -178,15 +581,28 @@ Respond ONLY with valid JSON (no extra text):
   "affordability_note": "<one sentence comparing ₹{plan['premium']['per_day']}/day to their ₹{profile.get('avg_monthly_income',15000)/30:.0f}/day income>"
 }}"""
 
-    try:
-        text = _call_groq(prompt)
+    async def _explain():
+        text = await _call_groq(prompt, on_token=on_token, stage="explain")
         explanation = _extract_json(text)
+        if _is_valid_explanation(explanation):
+            await llm_cache.aset(cache_key, explanation)
         return explanation
+
+    try:
+        return await llm_inflight.do(cache_key, _explain)
     except Exception as e:
         print(f"Groq explanation failed ({e}), using fallback")
+        fallbacks.inc(("explain_error",))
+        _mark_degraded(profile)
         return _fallback_explanation(plan, profile)
 
 
+def _mark_degraded(profile: dict):
+    degraded = _degraded.get()
+    if degraded is not None:
+        degraded.add(id(profile))
+
+
 def _fallback_explanation(plan: dict, profile: dict) -> dict:
     income = profile.get("avg_monthly_income", 15000)
     daily_income = income / 30
@@ -209,16 +625,114 @@ def _fallback_explanation(plan: dict, profile: dict) -> dict:
     }
 
 
+async def explain_plans_batch(profile: dict, top_plans: list) -> list[dict]:
+    """
+    Explain all top plans in ONE call. The worker summary is sent once and the
+    LLM returns a JSON object keyed by plan_id. Entries that are missing or
+    malformed are re-requested individually via explain_plan.
+    Plans already in the LLM cache are not sent at all.
+    """
+    catalog = _snapshot()
+    keys = [make_key("explain", profile, _plan_version(catalog, plan), plan["plan_id"]) for plan, _, _ in top_plans]
+    explanations = await llm_cache.aget_many(keys)
+    pending = [i for i, exp in enumerate(explanations) if exp is None]
+    if not pending:
+        return explanations
+
+    worker_text = _worker_summary(profile)
+    emp = profile.get("employment_type", "delivery")
+    daily_income = profile.get("avg_monthly_income", 15000) / 30
+    plans_text = "\n\n".join(
+        f"plan_id: {top_plans[i][0]['plan_id']}\n{catalog.fragments.detail(top_plans[i][0])}"
+        for i in pending
+    )
+
+    prompt = f"""You are a friendly insurance advisor helping a gig worker in India understand insurance plans.
+Use simple, everyday language. Avoid jargon. Imagine explaining to a friend who has never bought insurance.
+
+{worker_text}
+
+Plans:
+{plans_text}
+
+Write a personalised explanation of EACH plan tailored for a {emp} worker. Be warm, practical, and clear.
+Compare each plan's daily premium to their ₹{daily_income:.0f}/day income in the affordability note.
+
+Respond ONLY with a valid JSON object keyed by plan_id (no extra text):
+{{
+  "<plan_id>": {{
+    "plain_explanation": "<2-3 sentences explaining the plan like a friend would>",
+    "simple_what_covered": ["<short point 1>", "<short point 2>", "<short point 3>"],
+    "simple_what_not_covered": ["<short point 1>", "<short point 2>"],
+    "simple_how_to_claim": "<one sentence, very practical>",
+    "bottom_line": "<one sentence: should this worker buy it? why?>",
+    "affordability_note": "<one sentence comparing the daily premium to their daily income>"
+  }}
+}}"""
+
+    async def _explain_batch():
+        text = await _call_groq(prompt, stage="explain_batch")
+        batch = _extract_json(text)
+        if not isinstance(batch, dict):
+            raise ValueError("expected a JSON object keyed by plan_id")
+        return batch
+
+    batch_key = "batch:" + hashlib.sha256("|".join(keys[i] for i in pending).encode()).hexdigest()[:20]
+    try:
+        batch = await llm_inflight.do(batch_key, _explain_batch)
+    except Exception as e:
+        print(f"Groq batch explanation failed ({e}), explaining plans individually")
+        batch = {}
+
+    retry = []
+    for i in pending:
+        exp = batch.get(top_plans[i][0]["plan_id"])
+        if _is_valid_explanation(exp):
+            explanations[i] = exp
+            await llm_cache.aset(keys[i], exp)
+        else:
+            retry.append(i)
+    if retry:
+        retried = await asyncio.gather(*(explain_plan(profile, *top_plans[i]) for i in retry))
+        for i, exp in zip(retry, retried):
+            explanations[i] = exp
+    return explanations
+
+
 # ── Main pipeline ─────────────────────────────────────────────────────────────
 
-async def get_recommendations(profile: dict, plans: list, top_n: int = 3) -> list[dict]:
+async def get_recommendations(
+    profile: dict,
+    plans: list,
+    top_n: int = 3,
+    explain_mode: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+    catalog: Optional[CatalogSnapshot] = None,
+) -> list[dict]:
     """
     Full pipeline: rank all plans → explain top N → return enriched list.
-    Sequential with 2s gap to be polite to Groq free tier (14,400 req/day).
+    Explanations run concurrently (or as one batched call when explain_mode
+    is "batch"); pacing against the Groq quota (14,400 req/day) is handled
+    by the shared rate limiter in _call_groq.
+
+    The whole pipeline runs under a deadline budget (deadline_ms, default
+    RECOMMEND_DEADLINE_MS). LLM calls that cannot fit in what is left fall
+    straight through to the rule-based ranking / fallback explanation.
+
+    `catalog` is the snapshot `plans` were taken from (default: the active one).
     """
-    # Stage 1: rank (1 call)
-    rankings = await rank_plans(profile, plans)
+    budget_ms = deadline_ms if deadline_ms is not None else RECOMMEND_DEADLINE_MS
+    token = _deadline.set(time.monotonic() + budget_ms / 1000) if budget_ms else None
+    catalog_token = _catalog.set(catalog or catalog_store.snapshot)
+    try:
+        return await _run_pipeline(profile, plans, top_n, explain_mode)
+    finally:
+        _catalog.reset(catalog_token)
+        if token is not None:
+            _deadline.reset(token)
 
+
+def _select_top(rankings: list, plans: list, top_n: int) -> list[tuple]:
     score_map = {r["plan_id"]: r for r in rankings}
     scored_plans = []
     for p in plans:
@@ -226,14 +740,12 @@ async def get_recommendations(profile: dict, plans: list, top_n: int = 3) -> lis
         scored_plans.append((p, r["match_score"], r["why_it_fits"]))
 
     scored_plans.sort(key=lambda x: x[1], reverse=True)
-    top_plans = scored_plans[:top_n]
+    return scored_plans[:top_n]
+
 
-    # Stage 2: explain SEQUENTIALLY with delay
+def _build_results(top_plans: list, explanations: list) -> list[dict]:
     results = []
-    for i, (plan, score, why) in enumerate(top_plans):
-        if i > 0:
-            await asyncio.sleep(_RATE_LIMIT_DELAY)
-        explanation = await explain_plan(profile, plan, score, why)
+    for i, ((plan, score, why), explanation) in enumerate(zip(top_plans, explanations)):
         results.append({
             "plan": plan,
             "match_score": score,
@@ -241,5 +753,185 @@ async def get_recommendations(profile: dict, plans: list, top_n: int = 3) -> lis
             "ai_explanation": explanation,
             "rank": i + 1,
         })
-
     return results
+
+
+async def _run_pipeline(profile: dict, plans: list, top_n: int, explain_mode: Optional[str]) -> list[dict]:
+    # Stage 1: rank (1 call)
+    with span("rank"):
+        rankings = await rank_plans(profile, plans, top_n)
+        top_plans = _select_top(rankings, plans, top_n)
+
+    # Stage 2: explain in one batched call, or CONCURRENTLY under the global limiter
+    with span("explain"):
+        if (explain_mode or EXPLAIN_MODE) == "batch":
+            explanations = await explain_plans_batch(profile, top_plans)
+        else:
+            explanations = await asyncio.gather(*(
+                explain_plan(profile, plan, score, why) for plan, score, why in top_plans
+            ))
+
+    return _build_results(top_plans, explanations)
+
+
+def get_fallback_recommendations(
+    profile: dict, plans: list, top_n: int = 3, catalog: Optional[CatalogSnapshot] = None,
+) -> list[dict]:
+    """Deterministic, LLM-free pipeline used when the service sheds load."""
+    emp = profile.get("employment_type", "delivery")
+    risk = profile.get("risk_classification", "MEDIUM")
+    why = f"Good match for {emp} workers with {risk.lower()} risk profile."
+
+    compiled, positions = _compiled_for(plans, catalog)
+    scores = score_profiles(compiled, [profile], positions)[0]
+    top_plans = [(plans[i], int(scores[i]), why) for i in top_n_indices(scores, top_n)]
+    return _build_results(top_plans, [_fallback_explanation(plan, profile) for plan, _, _ in top_plans])
+
+
+async def stream_recommendations(
+    profile: dict,
+    plans: list,
+    top_n: int = 3,
+    explain_mode: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+    catalog: Optional[CatalogSnapshot] = None,
+    stream_tokens: bool = False,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    get_recommendations as a stream of (event, data) pairs:
+
+      rankings     – the ranked top-N cards (without explanations), right after stage 1
+      token        – {"rank", "plan_id", "delta"} LLM text as it is generated
+                     (stream_tokens=True, individual explain mode only)
+      explanation  – {"rank", "plan_id", "ai_explanation"} as each plan's explanation completes
+    """
+    budget_ms = deadline_ms if deadline_ms is not None else RECOMMEND_DEADLINE_MS
+    # Restored with set() rather than reset(): a generator that is never
+    # closed explicitly is finalized in another Context, where tokens fail
+    previous = _deadline.get(), _catalog.get()
+    if budget_ms:
+        _deadline.set(time.monotonic() + budget_ms / 1000)
+    _catalog.set(catalog or catalog_store.snapshot)
+    tasks = []
+    try:
+        with span("rank"):
+            rankings = await rank_plans(profile, plans, top_n)
+            top_plans = _select_top(rankings, plans, top_n)
+        yield "rankings", {"recommendations": _build_results(top_plans, [None] * len(top_plans))}
+
+        if (explain_mode or EXPLAIN_MODE) == "batch":
+            explanations = await explain_plans_batch(profile, top_plans)
+            for rank, ((plan, _, _), explanation) in enumerate(zip(top_plans, explanations), start=1):
+                yield "explanation", {"rank": rank, "plan_id": plan["plan_id"], "ai_explanation": explanation}
+            return
+
+        # One queue carries token deltas and finished explanations in arrival order
+        events: asyncio.Queue = asyncio.Queue()
+
+        def _token_sink(rank: int, plan: dict):
+            return lambda delta: events.put_nowait(("token", {"rank": rank, "plan_id": plan["plan_id"], "delta": delta}))
+
+        async def _explain(rank: int, plan: dict, score: int, why: str):
+            on_token = _token_sink(rank, plan) if stream_tokens else None
+            explanation = await explain_plan(profile, plan, score, why, on_token=on_token)
+            events.put_nowait(("explanation", {"rank": rank, "plan_id": plan["plan_id"], "ai_explanation": explanation}))
+
+        tasks = [
+            asyncio.create_task(_explain(rank, plan, score, why))
+            for rank, (plan, score, why) in enumerate(top_plans, start=1)
+        ]
+        remaining = len(tasks)
+        while remaining:
+            event, data = await events.get()
+            if event == "explanation":
+                remaining -= 1
+            yield event, data
+    finally:
+        for task in tasks:
+            task.cancel()
+        _deadline.set(previous[0])
+        _catalog.set(previous[1])
+
+
+async def get_recommendations_batch(
+    profiles: list[dict],
+    plan_sets: list[list],
+    top_ns: list[int],
+    explain_mode: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+    catalog: Optional[CatalogSnapshot] = None,
+) -> tuple[list[list[dict]], dict]:
+    """
+    Recommendations for a cohort; profiles[i] is matched against plan_sets[i].
+
+    Workers in the same cache bucket with the same eligible plans and top_n get
+    one shared result. Distinct buckets with the same plan set are ranked
+    RANK_BATCH_SIZE at a time in one prompt (rank_plans_multi); explanations
+    then run per bucket through the usual cache and single-flight. Every LLM
+    call draws from the shared rate limiter. Returns (results, grouping stats);
+    stats["degraded"] lists the indices whose ranking or explanations fell
+    back to the rule-based / template path (LLM error, open breaker, quota).
+    """
+    budget_ms = deadline_ms if deadline_ms is not None else RECOMMEND_DEADLINE_MS
+    token = _deadline.set(time.monotonic() + budget_ms / 1000) if budget_ms else None
+    catalog = catalog or catalog_store.snapshot
+    catalog_token = _catalog.set(catalog)
+    degraded_ids: set = set()
+    degraded_token = _degraded.set(degraded_ids)
+    try:
+        # 1. Collapse workers that would receive the same answer
+        groups: dict = {}
+        for i, (profile, plans, top_n) in enumerate(zip(profiles, plan_sets, top_ns)):
+            key = (profile_fingerprint(profile), _plan_set_key(catalog, plans), top_n)
+            groups.setdefault(key, []).append(i)
+        leaders = [members[0] for members in groups.values()]
+
+        # 2. Rank: leaders sharing a plan set go RANK_BATCH_SIZE per prompt
+        by_plan_set: dict = {}
+        for i in leaders:
+            by_plan_set.setdefault(_plan_set_key(catalog, plan_sets[i]), []).append(i)
+        chunks = [
+            members[k:k + RANK_BATCH_SIZE]
+            for members in by_plan_set.values()
+            for k in range(0, len(members), RANK_BATCH_SIZE)
+        ]
+        gate = asyncio.Semaphore(RECOMMEND_BATCH_CONCURRENCY)
+
+        async def _rank_chunk(chunk: list):
+            async with gate:
+                return await rank_plans_multi([profiles[i] for i in chunk], plan_sets[chunk[0]], [top_ns[i] for i in chunk])
+
+        rankings = {}
+        for chunk, ranked in zip(chunks, await asyncio.gather(*(_rank_chunk(c) for c in chunks))):
+            rankings.update(zip(chunk, ranked))
+
+        # 3. Explain the top plans of each leader
+        async def _explain(i: int) -> list[dict]:
+            top_plans = _select_top(rankings[i], plan_sets[i], top_ns[i])
+            async with gate:
+                if (explain_mode or EXPLAIN_MODE) == "batch":
+                    explanations = await explain_plans_batch(profiles[i], top_plans)
+                else:
+                    explanations = await asyncio.gather(*(
+                        explain_plan(profiles[i], plan, score, why) for plan, score, why in top_plans
+                    ))
+            return _build_results(top_plans, explanations)
+
+        leader_results = dict(zip(leaders, await asyncio.gather(*(_explain(i) for i in leaders))))
+        results = [None] * len(profiles)
+        degraded = []
+        for members in groups.values():
+            for i in members:
+                results[i] = leader_results[members[0]]
+            if id(profiles[members[0]]) in degraded_ids:
+                degraded += members
+        stats = {
+            "profiles": len(profiles), "groups": len(groups), "rank_batches": len(chunks),
+            "degraded": sorted(degraded),
+        }
+        return results, stats
+    finally:
+        _degraded.reset(degraded_token)
+        _catalog.reset(catalog_token)
+        if token is not None:
+            _deadline.reset(token)
@@ -0,0 +1,95 @@
+"""
+Catalog Index
+Lookup structures built once when the catalog is loaded.
+
+  - inverted indexes: category / target worker type / provider → plan positions
+  - premium- and coverage-sorted position arrays for range queries
+    (max_daily_premium, min_coverage) answered with bisect
+
+A query starts from the smallest candidate set among the active filters and
+checks the remaining predicates per candidate, so its cost follows the size
+of the result rather than the size of the catalog. Results keep catalog order.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Optional
+
+
+class CatalogIndex:
+    def __init__(self, plans: list):
+        self.plans = list(plans)
+
+        by_category, by_worker, by_provider = defaultdict(list), defaultdict(list), defaultdict(list)
+        for i, p in enumerate(self.plans):
+            by_category[p["category"]].append(i)
+            by_provider[p["provider"]].append(i)
+            for w in set(p.get("target_workers", [])):
+                by_worker[w].append(i)
+        self.by_category = dict(by_category)
+        self.by_target_worker = dict(by_worker)
+        self.by_provider = dict(by_provider)
+
+        self._premium_order = sorted(range(len(self.plans)), key=lambda i: self.plans[i]["premium"]["per_day"])
+        self._premium_sorted = [self.plans[i]["premium"]["per_day"] for i in self._premium_order]
+        self._coverage_order = sorted(range(len(self.plans)), key=lambda i: self.plans[i]["coverage_amount"])
+        self._coverage_sorted = [self.plans[i]["coverage_amount"] for i in self._coverage_order]
+
+        self._target_sets = {w: set(pos) for w, pos in self.by_target_worker.items()}
+        self._eligible_cache: dict = {}
+
+    def _premium_at_most(self, limit: float) -> list:
+        return self._premium_order[:bisect_right(self._premium_sorted, limit)]
+
+    def _coverage_at_least(self, floor: float) -> list:
+        return self._coverage_order[bisect_left(self._coverage_sorted, floor):]
+
+    def query(
+        self,
+        category: Optional[str] = None,
+        employment_type: Optional[str] = None,
+        provider: Optional[str] = None,
+        max_daily_premium: Optional[float] = None,
+        min_coverage: Optional[float] = None,
+    ) -> list:
+        """Plans matching every given filter, in catalog order."""
+        candidates = []
+        if category is not None:
+            candidates.append(self.by_category.get(category, []))
+        if employment_type is not None:
+            candidates.append(self.by_target_worker.get(employment_type, []))
+        if provider is not None:
+            candidates.append(self.by_provider.get(provider, []))
+        if max_daily_premium is not None:
+            candidates.append(self._premium_at_most(max_daily_premium))
+        if min_coverage is not None:
+            candidates.append(self._coverage_at_least(min_coverage))
+        if not candidates:
+            return list(self.plans)
+
+        def matches(i: int) -> bool:
+            p = self.plans[i]
+            return (
+                (category is None or p["category"] == category)
+                and (employment_type is None or i in self._target_sets.get(employment_type, ()))
+                and (provider is None or p["provider"] == provider)
+                and (max_daily_premium is None or p["premium"]["per_day"] <= max_daily_premium)
+                and (min_coverage is None or p["coverage_amount"] >= min_coverage)
+            )
+
+        smallest = min(candidates, key=len)
+        return [self.plans[i] for i in sorted(i for i in smallest if matches(i))]
+
+    def eligible(self, employment_type: str) -> list:
+        """
+        Plans a worker of this type may be recommended: plans targeting the
+        type plus plans open to freelancers; the whole catalog if none match.
+        """
+        if employment_type not in self._target_sets:
+            employment_type = None   # unknown types all resolve to the freelancer-open plans
+        cached = self._eligible_cache.get(employment_type)
+        if cached is None:
+            positions = self._target_sets.get(employment_type, set()) | self._target_sets.get("freelancer", set())
+            cached = [self.plans[i] for i in sorted(positions)] or self.plans
+            self._eligible_cache[employment_type] = cached
+        return cached
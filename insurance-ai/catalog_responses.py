@@ -0,0 +1,161 @@
+"""
+Catalog Responses
+Pre-serialized, ETag-tagged bodies for the read-only /catalog and /providers
+endpoints.
+
+When the catalog is loaded, the body for every category × employment_type
+filter combination (and the providers list) is serialized once, hashed into
+a content ETag and gzip-compressed. Requests with other filters (provider,
+numeric ranges) are serialized on first use and kept in a small LRU. Clients
+that send a matching If-None-Match get an empty 304.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request, Response
+
+from catalog_index import CatalogIndex
+
+try:
+    import orjson
+except ImportError:  # optional fast encoder
+    orjson = None
+
+CATALOG_RESPONSE_CACHE_SIZE = int(os.getenv("CATALOG_RESPONSE_CACHE_SIZE", "256"))
+GZIP_MIN_BYTES = 1024
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class CachedBody:
+    __slots__ = ("body", "gzip_body", "etag", "gzip_etag")
+
+    def __init__(self, payload):
+        self.body = dumps(payload)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0) if len(self.body) >= GZIP_MIN_BYTES else None
+        # Each content coding is its own representation with its own strong ETag
+        self.gzip_etag = f'"{digest}-gz"' if self.gzip_body is not None else None
+
+
+def _etag_matches(if_none_match: Optional[str], etags: tuple) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") in etags for t in tags)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """gzip (or `*`, when gzip is not listed) with a non-zero q-value."""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.strip().lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def respond(request: Request, cached: CachedBody) -> Response:
+    """304 if the client already has this body, else the (compressed) bytes."""
+    use_gzip = cached.gzip_body is not None and _accepts_gzip(request.headers.get("accept-encoding", ""))
+    etag = cached.gzip_etag if use_gzip else cached.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), (cached.etag, cached.gzip_etag)):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def catalog_payload(plans: list) -> dict:
+    return {
+        "total": len(plans),
+        "plans": plans,
+        "providers": list(dict.fromkeys(p["provider"] for p in plans)),
+    }
+
+
+def providers_payload(plans: list) -> dict:
+    providers = {}
+    for p in plans:
+        prov = p["provider"]
+        if prov not in providers:
+            providers[prov] = {
+                "name": prov,
+                "logo": p["provider_logo"],
+                "irdai_registered": p["irdai_registered"],
+                "rating": p["rating"],
+                "plan_count": 0,
+                "website": p["provider_website"],
+            }
+        providers[prov]["plan_count"] += 1
+    return {"providers": list(providers.values())}
+
+
+class CatalogResponses:
+    def __init__(self, index: CatalogIndex):
+        self.index = index
+        self.providers = CachedBody(providers_payload(index.plans))
+
+        self._precomputed = {}
+        for category in [None, *index.by_category]:
+            for employment_type in [None, *index.by_target_worker]:
+                plans = index.query(category=category, employment_type=employment_type)
+                self._precomputed[(category, employment_type)] = CachedBody(catalog_payload(plans))
+        self._lru: OrderedDict = OrderedDict()
+        self._lru_lock = threading.Lock()   # /catalog is a sync endpoint: threadpool workers share the LRU
+
+    def catalog(
+        self,
+        category: Optional[str] = None,
+        employment_type: Optional[str] = None,
+        provider: Optional[str] = None,
+        max_daily_premium: Optional[float] = None,
+        min_coverage: Optional[float] = None,
+    ) -> CachedBody:
+        key = (category, employment_type, provider, max_daily_premium, min_coverage)
+        if provider is None and max_daily_premium is None and min_coverage is None:
+            cached = self._precomputed.get(key[:2])
+            if cached is not None:
+                return cached
+
+        with self._lru_lock:
+            cached = self._lru.get(key)
+            if cached is not None:
+                self._lru.move_to_end(key)
+                return cached
+        plans = self.index.query(
+            category=category,
+            employment_type=employment_type,
+            provider=provider,
+            max_daily_premium=max_daily_premium,
+            min_coverage=min_coverage,
+        )
+        cached = CachedBody(catalog_payload(plans))
+        with self._lru_lock:
+            self._lru[key] = cached
+            if len(self._lru) > CATALOG_RESPONSE_CACHE_SIZE:
+                self._lru.popitem(last=False)
+        return cached
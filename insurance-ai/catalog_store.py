@@ -0,0 +1,208 @@
+"""
+Catalog Store
+Versioned, hot-reloadable insurance catalog.
+
+The catalog is read from CATALOG_PATH (a JSON list of plans, or
+{"plans": [...]}); without a file it is seeded from INSURER_CATALOG. Every
+load builds a complete immutable CatalogSnapshot — index, pre-serialized
+responses, compiled scoring columns and prompt fragments — and then swaps it
+in with a single reference assignment, so a request that holds a snapshot
+keeps seeing one consistent catalog while a reload happens.
+
+snapshot.version is the content hash of the plans and snapshot.plan_versions
+holds one hash per plan. LLM cache keys include them, so a plan change
+invalidates exactly the cached rankings and explanations that used it.
+
+apply_diff() updates the active catalog with just the changed plans (used by
+catalog_sync); text derived from untouched plans is carried over.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from catalog_index import CatalogIndex
+from catalog_responses import CatalogResponses
+from insurer_catalog import INSURER_CATALOG, catalog_version, plan_version
+from prompt_fragments import PromptFragments
+from ranking_engine import CompiledCatalog
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", "")
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "30"))   # seconds, 0 = no file watching
+
+REQUIRED_FIELDS = (
+    "plan_id", "plan_name", "provider", "category", "target_workers", "premium",
+    "coverage_amount", "inclusions", "exclusions", "claim_process",
+    "provider_logo", "provider_website", "irdai_registered", "rating",
+)
+NUMERIC_FIELDS = ("coverage_amount", "rating")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class CatalogError(ValueError):
+    """The catalog data is malformed; the active snapshot is left in place."""
+
+
+def validate_plans(plans) -> list:
+    if not isinstance(plans, list) or not plans:
+        raise CatalogError("catalog must be a non-empty list of plans")
+    seen = set()
+    for i, p in enumerate(plans):
+        if not isinstance(p, dict):
+            raise CatalogError(f"plan {i}: expected an object")
+        missing = [f for f in REQUIRED_FIELDS if f not in p]
+        if missing:
+            raise CatalogError(f"plan {i}: missing {', '.join(missing)}")
+        if not isinstance(p["premium"], dict) or "per_day" not in p["premium"]:
+            raise CatalogError(f"plan {p['plan_id']}: premium.per_day is required")
+        wrong = [f for f in NUMERIC_FIELDS if not _is_number(p[f])]
+        if not _is_number(p["premium"]["per_day"]):
+            wrong.append("premium.per_day")
+        if wrong:
+            raise CatalogError(f"plan {p['plan_id']}: {', '.join(wrong)} must be numeric")
+        if not isinstance(p["target_workers"], list):
+            raise CatalogError(f"plan {p['plan_id']}: target_workers must be a list")
+        if p["plan_id"] in seen:
+            raise CatalogError(f"duplicate plan_id {p['plan_id']}")
+        seen.add(p["plan_id"])
+    return plans
+
+
+class CatalogSnapshot:
+    """One catalog version and every structure derived from it."""
+
+    def __init__(self, plans: list, source: str, previous: Optional["CatalogSnapshot"] = None):
+        self.plans = plans
+        self.plan_versions = {p["plan_id"]: plan_version(p) for p in plans}
+        self.version = catalog_version(plans, list(self.plan_versions.values()))
+        self.source = source
+        self.loaded_at = time.time()
+        self.by_id = {p["plan_id"]: p for p in plans}
+        self.index = CatalogIndex(plans)
+        self.responses = CatalogResponses(self.index)
+        self.compiled = CompiledCatalog(plans)
+        self.fragments = PromptFragments(plans, self.plan_versions, previous.fragments if previous else None)
+
+
+def build_snapshot(plans: list, source: str, previous: Optional[CatalogSnapshot] = None) -> CatalogSnapshot:
+    """CatalogSnapshot for validated plans; any failure while deriving it is a CatalogError."""
+    try:
+        return CatalogSnapshot(plans, source, previous)
+    except Exception as e:
+        raise CatalogError(f"could not build catalog snapshot: {e.__class__.__name__}: {e}") from e
+
+
+class CatalogStore:
+    def __init__(self, path: str = CATALOG_PATH, seed: Optional[list] = None):
+        self.path = path
+        self.seed = INSURER_CATALOG if seed is None else seed
+        self._lock = threading.Lock()      # serialises rebuilds, never held by readers
+        self._mtime: Optional[float] = None
+        self.reloads = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._snapshot = self._load()
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    def _read_file(self) -> list:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("plans") if isinstance(data, dict) else data
+
+    def _load(self) -> CatalogSnapshot:
+        if self.path and os.path.exists(self.path):
+            try:
+                self._mtime = os.path.getmtime(self.path)
+                return build_snapshot(validate_plans(self._read_file()), source=self.path)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"Warning: could not load {self.path} ({e}), using the built-in catalog")
+        return build_snapshot(validate_plans(list(self.seed)), source="seed")
+
+    def publish(self, plans: list, source: str) -> bool:
+        """Build a snapshot for `plans` and swap it in. False if the content is unchanged."""
+        plans = validate_plans(plans)
+        with self._lock:
+            if catalog_version(plans) == self._snapshot.version:
+                return False
+            snapshot = build_snapshot(plans, source, previous=self._snapshot)
+            self._snapshot = snapshot
+            self.reloads += 1
+        print(f"Catalog {snapshot.version} active ({len(plans)} plans from {source})")
+        return True
+
+    def apply_diff(self, upserts: list, removals: set, source: str) -> bool:
+        """
+        Add/replace `upserts` (by plan_id) and drop `removals` from the active
+        catalog, keeping catalog order. False if nothing actually changed.
+        """
+        with self._lock:
+            current = self._snapshot
+            pending = {p["plan_id"]: p for p in upserts
+                       if current.plan_versions.get(p["plan_id"]) != plan_version(p)}
+            removals = {pid for pid in removals if pid in current.by_id and pid not in pending}
+            if not pending and not removals:
+                return False
+            plans = [pending.pop(p["plan_id"], p) for p in current.plans if p["plan_id"] not in removals]
+            plans.extend(pending.values())
+            snapshot = build_snapshot(validate_plans(plans), source, previous=current)
+            self._snapshot = snapshot
+            self.reloads += 1
+        print(f"Catalog {snapshot.version} active ({len(plans)} plans, diff from {source})")
+        return True
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read CATALOG_PATH if it changed on disk. Bad data keeps the old snapshot."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            mtime = os.path.getmtime(self.path)
+            if not force and mtime == self._mtime:
+                return False
+            self._mtime = mtime   # a bad file is reported once, not on every poll
+            return self.publish(self._read_file(), source=self.path)
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"Warning: catalog reload failed, keeping {self.version}: {e}")
+            return False
+
+    async def watch(self, interval: float = CATALOG_RELOAD_INTERVAL):
+        """Poll CATALOG_PATH and hot-swap on change (run as a background task)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"Warning: catalog watch failed, keeping {self.version}: {e}")
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        return {
+            "version": snap.version,
+            "source": snap.source,
+            "plans": len(snap.plans),
+            "loaded_at": snap.loaded_at,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+catalog_store = CatalogStore()
@@ -0,0 +1,272 @@
+"""
+Catalog Sync
+Background sync of insurer plan feeds into catalog_store.
+
+Every CATALOG_SYNC_INTERVAL seconds all feeds in CATALOG_FEEDS (comma-separated
+URLs, each serving a JSON list of plans or {"plans": [...]}) are fetched
+concurrently over one pooled httpx.AsyncClient. Requests are conditional
+(If-None-Match / If-Modified-Since), so an unchanged feed costs a 304 and no
+parsing. The plans of every feed are diffed against the active catalog by
+per-plan content hash; only added, changed and removed plans are applied,
+in a single catalog_store.apply_diff() per round. Parsing and the snapshot
+rebuild run in a worker thread, so request handling never waits on a sync.
+
+A feed owns the plans it has served; a plan that disappears from its feed is
+removed from the catalog. A failing feed keeps its last plans.
+
+Local testing against fixture feeds:
+
+    python catalog_sync.py stub --port 8765      # serve the built-in catalog, one feed per provider
+    python catalog_sync.py once http://127.0.0.1:8765/acko.json ...
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from catalog_store import CatalogStore, catalog_store, validate_plans
+from insurer_catalog import INSURER_CATALOG, plan_version
+
+CATALOG_FEEDS = [u.strip() for u in os.getenv("CATALOG_FEEDS", "").split(",") if u.strip()]
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "300"))   # seconds
+CATALOG_SYNC_TIMEOUT = float(os.getenv("CATALOG_SYNC_TIMEOUT", "10"))
+CATALOG_SYNC_MAX_CONNECTIONS = int(os.getenv("CATALOG_SYNC_MAX_CONNECTIONS", "10"))
+
+
+class FeedState:
+    def __init__(self, url: str):
+        self.url = url
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.plans: Optional[list] = None     # last good payload
+        self.owned: set = set()               # plan_ids this feed has served
+        self.status: Optional[int] = None
+        self.fetched_at: Optional[float] = None
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            "status": self.status,
+            "plans": None if self.plans is None else len(self.plans),
+            "etag": self.etag,
+            "fetched_at": self.fetched_at,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+def _parse_feed(body: bytes) -> list:
+    data = json.loads(body)
+    return validate_plans(data.get("plans") if isinstance(data, dict) else data)
+
+
+class CatalogSync:
+    def __init__(self, feeds: list, store: CatalogStore = catalog_store):
+        self.feeds = {url: FeedState(url) for url in feeds}
+        self.store = store
+        self._client = None
+        self.rounds = 0
+        self.applied = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_diff = {"added": 0, "updated": 0, "removed": 0}
+
+    async def start(self):
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=CATALOG_SYNC_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(CATALOG_SYNC_TIMEOUT),
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _fetch(self, feed: FeedState):
+        headers = {}
+        if feed.etag:
+            headers["If-None-Match"] = feed.etag
+        if feed.last_modified:
+            headers["If-Modified-Since"] = feed.last_modified
+        try:
+            response = await self._client.get(feed.url, headers=headers)
+            feed.status = response.status_code
+            feed.fetched_at = time.time()
+            if response.status_code == 304:
+                return
+            response.raise_for_status()
+            feed.plans = await asyncio.to_thread(_parse_feed, response.content)
+            feed.etag = response.headers.get("etag")
+            feed.last_modified = response.headers.get("last-modified")
+        except Exception as e:
+            feed.errors += 1
+            feed.last_error = str(e)
+            print(f"Warning: catalog feed {feed.url} failed: {e}")
+
+    def _diff(self) -> tuple[list, set, dict]:
+        """Upserts and removals that bring the active catalog in line with the feeds."""
+        current = self.store.snapshot
+        upserts, removals = [], set()
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        # A plan only goes away once no loaded feed serves it (it may have moved feeds)
+        served = {p["plan_id"] for feed in self.feeds.values() if feed.plans is not None for p in feed.plans}
+        for feed in self.feeds.values():
+            if feed.plans is None:
+                continue
+            for plan in feed.plans:
+                known = current.plan_versions.get(plan["plan_id"])
+                if known is None:
+                    counts["added"] += 1
+                    upserts.append(plan)
+                elif known != plan_version(plan):
+                    counts["updated"] += 1
+                    upserts.append(plan)
+            removals |= {pid for pid in feed.owned - served if pid in current.by_id}
+        counts["removed"] = len(removals)
+        return upserts, removals, counts
+
+    async def sync_once(self) -> dict:
+        """Fetch every feed and apply the resulting diff. Returns the diff counts."""
+        await self.start()
+        await asyncio.gather(*(self._fetch(f) for f in self.feeds.values()))
+        upserts, removals, counts = await asyncio.to_thread(self._diff)
+        self.rounds += 1
+        if upserts or removals:
+            try:
+                if await asyncio.to_thread(self.store.apply_diff, upserts, removals, "sync"):
+                    self.applied += 1
+            except Exception as e:
+                # CatalogError for bad data; anything else must not end the loop either
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"Warning: catalog sync diff rejected: {e}")
+                return counts
+        for feed in self.feeds.values():
+            if feed.plans is not None:
+                feed.owned = {p["plan_id"] for p in feed.plans}
+        self.last_diff = counts
+        return counts
+
+    async def run(self, interval: float = CATALOG_SYNC_INTERVAL):
+        """Sync forever (run as a background task)."""
+        try:
+            while True:
+                try:
+                    await self.sync_once()
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = str(e)
+                    print(f"Warning: catalog sync round failed: {e}")
+                await asyncio.sleep(interval)
+        finally:
+            await self.close()
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "applied": self.applied,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_diff": self.last_diff,
+            "feeds": {url: f.stats() for url, f in self.feeds.items()},
+        }
+
+
+catalog_sync = CatalogSync(CATALOG_FEEDS)
+
+
+# ── Stub feed server (local testing) ─────────────────────────────────────────
+
+def start_stub_server(feeds: dict, host: str = "127.0.0.1", port: int = 0):
+    """
+    Serve {name: [plans]} as /<name>.json with ETag / Last-Modified and 304
+    support, from a daemon thread. Returns (server, base_url); change a feed
+    with server.set_feed(name, plans).
+    """
+    from email.utils import formatdate
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            entry = self.server.bodies.get(self.path.lstrip("/").removesuffix(".json"))
+            if entry is None:
+                self.send_error(404)
+                return
+            body, etag, modified = entry
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.bodies = {}
+
+    def set_feed(name: str, plans: list):
+        body = json.dumps({"plans": plans}, ensure_ascii=False).encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        server.bodies[name] = (body, etag, formatdate(usegmt=True))
+
+    server.set_feed = set_feed
+    for name, plans in feeds.items():
+        set_feed(name, plans)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def builtin_feeds() -> dict:
+    """The built-in catalog split into one fixture feed per provider."""
+    feeds = {}
+    for plan in INSURER_CATALOG:
+        feeds.setdefault(plan["plan_id"].split("-")[0].lower(), []).append(plan)
+    return feeds
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Insurer catalog feed sync")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stub = sub.add_parser("stub", help="serve the built-in catalog as fixture feeds")
+    stub.add_argument("--port", type=int, default=8765)
+    once = sub.add_parser("once", help="run one sync round and print the result")
+    once.add_argument("urls", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        server, base = start_stub_server(builtin_feeds(), port=args.port)
+        for name in server.bodies:
+            print(f"{base}/{name}.json")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        sync = CatalogSync(args.urls, store=CatalogStore(path=""))
+
+        async def _main():
+            try:
+                print(json.dumps(await sync.sync_once()))
+                print(json.dumps(sync.stats(), indent=2))
+            finally:
+                await sync.close()
+
+        asyncio.run(_main())
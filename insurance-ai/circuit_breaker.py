@@ -0,0 +1,132 @@
+"""
+Circuit Breaker
+Stops sending traffic to the LLM provider while it is failing or slow.
+
+  CLOSED     – calls flow normally; failures and latencies are tracked
+  OPEN       – calls are refused immediately (callers use the rule-based path)
+  HALF_OPEN  – after a cool-down, a few probe calls are let through;
+               a success closes the breaker, a failure re-opens it
+
+The breaker opens after N consecutive failures, or when the configured
+latency percentile over the recent window exceeds a threshold.
+"""
+
+import os
+import time
+from collections import deque
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_LATENCY_PERCENTILE = float(os.getenv("BREAKER_LATENCY_PERCENTILE", "95"))
+BREAKER_LATENCY_THRESHOLD = float(os.getenv("BREAKER_LATENCY_THRESHOLD", "10"))  # seconds
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "50"))
+BREAKER_MIN_SAMPLES = int(os.getenv("BREAKER_MIN_SAMPLES", "10"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the breaker is open."""
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        latency_percentile: float = BREAKER_LATENCY_PERCENTILE,
+        latency_threshold: float = BREAKER_LATENCY_THRESHOLD,
+        window: int = BREAKER_WINDOW,
+        min_samples: int = BREAKER_MIN_SAMPLES,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+    ):
+        self.failure_threshold = failure_threshold
+        self.percentile = latency_percentile
+        self.latency_threshold = latency_threshold
+        self.min_samples = min_samples
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self._latencies: deque = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.counters = {"rejected": 0, "opened": 0, "successes": 0, "failures": 0}
+
+    def allow(self) -> bool:
+        """Return True if a call may go to the provider right now."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.counters["rejected"] += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.counters["rejected"] += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def record_success(self, latency: float):
+        self.counters["successes"] += 1
+        self._consecutive_failures = 0
+        if self.state == HALF_OPEN:
+            self._close()
+            return
+        self._latencies.append(latency)
+        if (
+            len(self._latencies) >= self.min_samples
+            and self.current_latency() > self.latency_threshold
+        ):
+            self._trip("latency")
+
+    def record_failure(self):
+        self.counters["failures"] += 1
+        self._consecutive_failures += 1
+        if self.state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            self._trip("failures")
+
+    def release_probe(self):
+        """Give back a half-open probe slot when a call ended without a verdict."""
+        if self.state == HALF_OPEN and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def current_latency(self) -> float:
+        """Configured latency percentile (seconds) over the recent window."""
+        return percentile(self._latencies, self.percentile)
+
+    def _trip(self, reason: str):
+        if self.state != OPEN:
+            print(f"LLM circuit breaker OPEN ({reason})")
+            self.counters["opened"] += 1
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+
+    def _close(self):
+        print("LLM circuit breaker CLOSED")
+        self.state = CLOSED
+        self._consecutive_failures = 0
+        self._latencies.clear()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            f"p{self.percentile:g}_latency": round(self.current_latency(), 3),
+            **self.counters,
+        }
+
+
+# Shared by every LLM call in this process
+llm_breaker = CircuitBreaker()
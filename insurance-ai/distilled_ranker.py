@@ -0,0 +1,327 @@
+"""
+Distilled Ranker
+A small local model trained on logged LLM ranking scores.
+
+  1. LOG    – with RANK_LOG_DB set, every successful LLM ranking is stored as
+              (profile, plan, match_score) rows, one request_id per ranking.
+  2. TRAIN  – `python distilled_ranker.py train` fits a bootstrap ensemble of
+              ridge regressions (NumPy only) on hand-built profile × plan
+              features and prints agreement metrics on a held-out split.
+  3. SERVE  – with RANK_MODE=distilled, rank_plans scores the plans locally
+              (one small matrix product, ~0.1 ms). Confidence is the
+              share of ensemble members that rank the caller's top_n plans
+              (at least the top-1) in the same order as the ensemble
+              mean; below DISTILLED_MIN_CONFIDENCE the LLM is
+              called as before and the two rankings are compared, so
+              agreement is tracked online as well.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+RANK_LOG_DB = os.getenv("RANK_LOG_DB", "")                                   # e.g. rank_log.sqlite3
+RANK_MODE = os.getenv("RANK_MODE", "llm")                                    # llm | distilled
+DISTILLED_MODEL_PATH = os.getenv("DISTILLED_MODEL_PATH", os.path.join(os.path.dirname(__file__), "distilled_ranker.npz"))
+DISTILLED_MIN_CONFIDENCE = float(os.getenv("DISTILLED_MIN_CONFIDENCE", "0.9"))
+
+AGREEMENT_TOP_K = 3
+PLAN_ROW_CACHE_SIZE = 512       # plan feature rows kept across catalog versions
+
+RISK_CLASSES = ("LOW", "MEDIUM", "HIGH")
+WORKER_TYPES = ("delivery", "driver", "freelancer")
+CATEGORIES = ("accident_health", "equipment", "health", "income_protection", "comprehensive")
+
+FEATURE_NAMES = (
+    "log_income", "risk_score", "stability", "active_days", "has_dependents",
+    *(f"risk_{r}" for r in RISK_CLASSES), *(f"worker_{w}" for w in WORKER_TYPES),
+    "log_per_day", "log_coverage", "rating", *(f"category_{c}" for c in CATEGORIES),
+    "targeted", "premium_income_ratio", "high_risk_x_log_coverage", "low_risk_x_log_per_day",
+    "dependents_x_income_protection", "rule_score",
+)
+
+
+# ── Features ──────────────────────────────────────────────────────────────────
+
+def _profile_row(profile: dict) -> list:
+    risk = profile.get("risk_classification", "MEDIUM")
+    emp = profile.get("employment_type", "delivery")
+    return [
+        math.log(max(float(profile.get("avg_monthly_income") or 15000), 1.0)),
+        float(profile.get("risk_score") or 50) / 100,
+        float(profile.get("work_stability_score") or 50) / 100,
+        float(profile.get("active_days_per_month") or 22) / 30,
+        1.0 if profile.get("has_dependents") else 0.0,
+        *(1.0 if risk == r else 0.0 for r in RISK_CLASSES),
+        *(1.0 if emp == w else 0.0 for w in WORKER_TYPES),
+    ]
+
+
+def _plan_row(plan: dict) -> list:
+    return [
+        math.log(max(float(plan["premium"]["per_day"]), 1.0)),
+        math.log(max(float(plan["coverage_amount"]), 1.0)),
+        float(plan.get("rating") or 4.0) / 5,
+        *(1.0 if plan["category"] == c else 0.0 for c in CATEGORIES),
+    ]
+
+
+def features(profile: dict, plans: list, plan_rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """(len(plans), len(FEATURE_NAMES)) feature matrix for one worker."""
+    n = len(plans)
+    prof = np.array(_profile_row(profile))
+    if plan_rows is None:
+        plan_rows = np.array([_plan_row(p) for p in plans]).reshape(n, 3 + len(CATEGORIES))
+    emp = profile.get("employment_type", "delivery")
+    risk = profile.get("risk_classification", "MEDIUM")
+    daily_income = float(profile.get("avg_monthly_income") or 15000) / 30
+
+    per_day = np.array([p["premium"]["per_day"] for p in plans], dtype=np.float64)
+    coverage = np.array([p["coverage_amount"] for p in plans], dtype=np.float64)
+    targeted = np.array([emp in p.get("target_workers", []) for p in plans], dtype=np.float64)
+    ratio = per_day / daily_income
+    # Same rules as ranking_engine.score_profiles, as a prior the model can lean on
+    rule = (50 + 20 * targeted + np.where(ratio < 0.002, 15, np.where(ratio < 0.004, 8, 0))
+            + 10 * ((risk == "HIGH") & (coverage >= 300000)) + 10 * ((risk == "LOW") & (per_day <= 20)))
+    income_protection = plan_rows[:, 3 + CATEGORIES.index("income_protection")]
+
+    return np.column_stack([
+        np.broadcast_to(prof, (n, len(prof))),
+        plan_rows,
+        targeted,
+        ratio,
+        (risk == "HIGH") * plan_rows[:, 1],
+        (risk == "LOW") * plan_rows[:, 0],
+        prof[4] * income_protection,
+        np.minimum(rule, 99) / 100,
+    ])
+
+
+# ── Logging ───────────────────────────────────────────────────────────────────
+
+class RankLog:
+    """Append-only SQLite log of LLM rankings (training data)."""
+
+    def __init__(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self.rows = 0
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rank_log ("
+            "request_id TEXT NOT NULL, logged_at REAL NOT NULL, profile TEXT NOT NULL, "
+            "plan TEXT NOT NULL, score REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def record(self, profile: dict, plans: list, rankings: list):
+        scores = {r["plan_id"]: r["match_score"] for r in rankings}
+        request_id, now = uuid.uuid4().hex, time.time()
+        profile_json = json.dumps(profile, default=str)
+        rows = [
+            (request_id, now, profile_json, json.dumps(p, ensure_ascii=False), float(scores[p["plan_id"]]))
+            for p in plans
+            if isinstance(scores.get(p["plan_id"]), (int, float))
+        ]
+        with self._db_lock, self._db:
+            self._db.executemany("INSERT INTO rank_log VALUES (?, ?, ?, ?, ?)", rows)
+        self.rows += len(rows)
+
+    def load(self) -> dict:
+        """{request_id: (profile, [plans], [scores])}"""
+        with self._db_lock:
+            rows = self._db.execute("SELECT request_id, profile, plan, score FROM rank_log ORDER BY rowid").fetchall()
+        requests = {}
+        for request_id, profile, plan, score in rows:
+            entry = requests.setdefault(request_id, (json.loads(profile), [], []))
+            entry[1].append(json.loads(plan))
+            entry[2].append(score)
+        return requests
+
+
+rank_log = RankLog(RANK_LOG_DB) if RANK_LOG_DB else None
+
+
+# ── Model ─────────────────────────────────────────────────────────────────────
+
+def _top_k(scores: np.ndarray, k: int) -> frozenset:
+    return frozenset(np.argsort(-scores, kind="stable")[:k].tolist())
+
+
+class DistilledRanker:
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, weights: np.ndarray, bias: np.ndarray, metrics: dict):
+        self.mean, self.scale = mean, scale
+        self.weights = weights          # (n_models, n_features)
+        self.bias = bias                # (n_models,)
+        self.metrics = metrics
+        self._plan_rows: OrderedDict = OrderedDict()   # (plan_id, plan version) → feature row, LRU
+        self.counters = {"served_local": 0, "llm_fallbacks": 0, "compared": 0, "top1_agree": 0, "abs_error_sum": 0.0}
+
+    @classmethod
+    def fit(cls, X: np.ndarray, y: np.ndarray, alpha: float = 1.0, n_models: int = 20, seed: int = 0):
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = (X - mean) / scale
+        rng = np.random.default_rng(seed)
+        weights, bias = [], []
+        for _ in range(n_models):
+            idx = rng.integers(0, len(Z), len(Z))
+            Zb, yb = Z[idx], y[idx]
+            zm, ym = Zb.mean(axis=0), yb.mean()
+            Zc = Zb - zm
+            w = np.linalg.solve(Zc.T @ Zc + alpha * np.eye(Z.shape[1]), Zc.T @ (yb - ym))
+            weights.append(w)
+            bias.append(ym - zm @ w)
+        return cls(mean, scale, np.array(weights), np.array(bias), {})
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        """(n_models, n_rows) ensemble predictions."""
+        return (((X - self.mean) / self.scale) @ self.weights.T + self.bias).T
+
+    def score(
+        self, profile: dict, plans: list, plan_keys: Optional[list] = None, top_n: int = AGREEMENT_TOP_K,
+    ) -> tuple[np.ndarray, float]:
+        """
+        Mean predicted match scores (0-100) for `plans` and the confidence: the
+        share of ensemble members that put the same plans in the same order in
+        the first `top_n` places (at least the top-1) as the mean does.
+        """
+        plan_rows = None
+        if plan_keys is not None:
+            rows = []
+            for key, plan in zip(plan_keys, plans):
+                row = self._plan_rows.get(key)
+                if row is None:
+                    row = self._plan_rows[key] = _plan_row(plan)
+                    if len(self._plan_rows) > PLAN_ROW_CACHE_SIZE:
+                        self._plan_rows.popitem(last=False)
+                else:
+                    self._plan_rows.move_to_end(key)
+                rows.append(row)
+            plan_rows = np.array(rows)
+        preds = self.predict_matrix(features(profile, plans, plan_rows))
+        mean = np.clip(preds.mean(axis=0), 0, 100)
+        k = max(1, min(top_n, len(plans)))
+        top = np.argsort(-mean, kind="stable")[:k]
+        members = np.argsort(-preds, axis=1, kind="stable")[:, :k]
+        return mean, float((members == top).all(axis=1).mean())
+
+    def record_comparison(self, local, llm_scores):
+        local, llm_scores = np.asarray(local, dtype=np.float64), np.asarray(llm_scores, dtype=np.float64)
+        self.counters["compared"] += 1
+        self.counters["top1_agree"] += int(np.argmax(local) == np.argmax(llm_scores))
+        self.counters["abs_error_sum"] += float(np.abs(local - llm_scores).mean())
+
+    def save(self, path: str):
+        np.savez(path, mean=self.mean, scale=self.scale, weights=self.weights, bias=self.bias,
+                 feature_names=np.array(FEATURE_NAMES), metrics=json.dumps(self.metrics))
+
+    @classmethod
+    def load(cls, path: str) -> "DistilledRanker":
+        with np.load(path) as data:
+            if tuple(data["feature_names"].tolist()) != FEATURE_NAMES:
+                raise ValueError("model was trained on a different feature set; retrain it")
+            return cls(data["mean"], data["scale"], data["weights"], data["bias"], json.loads(str(data["metrics"])))
+
+    def stats(self) -> dict:
+        c = self.counters
+        return {
+            "min_confidence": DISTILLED_MIN_CONFIDENCE,
+            "served_local": c["served_local"],
+            "llm_fallbacks": c["llm_fallbacks"],
+            "local_share": round(c["served_local"] / max(c["served_local"] + c["llm_fallbacks"], 1), 4),
+            "online_top1_agreement": round(c["top1_agree"] / c["compared"], 4) if c["compared"] else None,
+            "online_mae": round(c["abs_error_sum"] / c["compared"], 2) if c["compared"] else None,
+            "training": self.metrics,
+        }
+
+
+def load_distilled_ranker(path: str = DISTILLED_MODEL_PATH) -> Optional[DistilledRanker]:
+    if RANK_MODE != "distilled":
+        return None
+    try:
+        return DistilledRanker.load(path)
+    except Exception as e:
+        print(f"Warning: distilled ranker unavailable ({e}), ranking with the LLM")
+        return None
+
+
+distilled_ranker = load_distilled_ranker()
+
+
+# ── Training ──────────────────────────────────────────────────────────────────
+
+def _agreement(model: DistilledRanker, requests: list, min_confidence: float) -> dict:
+    top1 = overlap = spearman = confident = confident_top1 = 0
+    abs_errors = []
+    for profile, plans, scores in requests:
+        y = np.array(scores)
+        pred, confidence = model.score(profile, plans)
+        k = min(AGREEMENT_TOP_K, len(plans))
+        hit = int(np.argmax(pred) == np.argmax(y))
+        top1 += hit
+        overlap += len(_top_k(pred, k) & _top_k(y, k)) / k
+        if len(plans) > 1:
+            rp, ry = np.argsort(np.argsort(pred)), np.argsort(np.argsort(y))
+            spearman += np.corrcoef(rp, ry)[0, 1] if rp.std() and ry.std() else 0.0
+        abs_errors.extend(np.abs(pred - y).tolist())
+        if confidence >= min_confidence:
+            confident += 1
+            confident_top1 += hit
+    n = len(requests)
+    return {
+        "requests": n,
+        "mae": round(float(np.mean(abs_errors)), 2),
+        "top1_agreement": round(top1 / n, 4),
+        f"top{AGREEMENT_TOP_K}_overlap": round(overlap / n, 4),
+        "spearman": round(spearman / n, 4),
+        "confident_share": round(confident / n, 4),
+        "confident_top1_agreement": round(confident_top1 / confident, 4) if confident else None,
+    }
+
+
+def train(log: RankLog, out: str, holdout: float = 0.2, alpha: float = 1.0, n_models: int = 20, seed: int = 0) -> dict:
+    requests = list(log.load().values())
+    if len(requests) < 10:
+        raise SystemExit(f"only {len(requests)} logged rankings; collect more with RANK_LOG_DB first")
+    order = np.random.default_rng(seed).permutation(len(requests))
+    n_test = max(1, int(len(requests) * holdout))
+    test = [requests[i] for i in order[:n_test]]
+    train_set = [requests[i] for i in order[n_test:]]
+
+    X = np.vstack([features(p, plans) for p, plans, _ in train_set])
+    y = np.concatenate([np.array(scores, dtype=np.float64) for _, _, scores in train_set])
+    model = DistilledRanker.fit(X, y, alpha=alpha, n_models=n_models, seed=seed)
+    model.metrics = {
+        "trained_at": time.time(),
+        "train_requests": len(train_set),
+        "train_rows": int(len(y)),
+        "holdout": _agreement(model, test, DISTILLED_MIN_CONFIDENCE),
+    }
+    model.save(out)
+    return model.metrics
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distilled stage-1 ranker")
+    sub = parser.add_subparsers(dest="command", required=True)
+    t = sub.add_parser("train", help="fit on the ranking log and report holdout agreement")
+    t.add_argument("--log", default=RANK_LOG_DB or "rank_log.sqlite3")
+    t.add_argument("--out", default=DISTILLED_MODEL_PATH)
+    t.add_argument("--holdout", type=float, default=0.2)
+    t.add_argument("--alpha", type=float, default=1.0, help="ridge regularisation")
+    t.add_argument("--models", type=int, default=20, help="bootstrap ensemble size")
+    args = parser.parse_args()
+
+    metrics = train(RankLog(args.log), args.out, args.holdout, args.alpha, args.models)
+    print(json.dumps(metrics, indent=2))
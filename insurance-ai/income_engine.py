@@ -0,0 +1,101 @@
+"""
+Income Engine
+Vectorized (NumPy) version of the /predict_income heuristic.
+
+Each input field is a column; categorical adjustments (vehicle type, skill
+level, platform level) are array lookups and the performance / demand
+multipliers are array arithmetic performed in the same operation order as the
+original per-profile loop. Jitter for the whole batch is drawn in one call
+from a Mersenne Twister whose state is copied from a `random.Random`, so with
+a fixed seed the predictions are bit-identical to calling `random.uniform`
+once per profile.
+"""
+
+import random
+from operator import attrgetter
+from typing import Optional
+
+import numpy as np
+
+# Columns the heuristic reads
+NUMERIC_FIELDS = (
+    "base_pay_total", "tips_total", "bonus_earned", "surge_earnings",
+    "incentives_received", "deductions", "years_of_experience",
+    "total_hours_worked_month", "acceptance_rate", "cancellation_rate",
+    "avg_rating", "demand_index",
+)
+CATEGORICAL_FIELDS = ("vehicle_type", "skill_level", "platform_level")
+
+# Hourly-rate adjustments (INR/hr) and performance bonuses
+VEHICLE_RATE = {"car": 50, "bike": 30}
+SKILL_RATE = {"expert": 40, "intermediate": 20}
+PLATFORM_BONUS = {"diamond": 0.15, "platinum": 0.15, "gold": 0.10}
+
+JITTER_LOW, JITTER_HIGH = -0.05, 0.08
+
+
+def columns_from_profiles(profiles: list) -> dict:
+    """Turn a list of GigWorkerIncomeData-like objects into input columns."""
+    n = len(profiles)
+    cols = {f: np.fromiter(map(attrgetter(f), profiles), dtype=np.float64, count=n) for f in NUMERIC_FIELDS}
+    for f in CATEGORICAL_FIELDS:
+        cols[f] = np.array(list(map(attrgetter(f), profiles)), dtype=object)
+    return cols
+
+
+def _lookup(values: np.ndarray, table: dict, default) -> np.ndarray:
+    """Map a categorical column through a small `table` (one array compare per key)."""
+    out = np.full(len(values), default, dtype=np.float64)
+    for key, value in table.items():
+        out[values == key] = value
+    return out
+
+
+def draw_jitter(n: int, rng: random.Random) -> np.ndarray:
+    """
+    n draws equal to [rng.uniform(-0.05, 0.08) for _ in range(n)], generated
+    in one vectorized call. `rng` is advanced exactly as the loop would.
+    """
+    version, internal, gauss_next = rng.getstate()
+    mt = np.random.RandomState()
+    mt.set_state(("MT19937", np.array(internal[:-1], dtype=np.uint32), internal[-1]))
+    u = mt.random_sample(n)
+    _, key, pos, _, _ = mt.get_state()
+    rng.setstate((version, tuple(int(k) for k in key) + (int(pos),), gauss_next))
+    return JITTER_LOW + (JITTER_HIGH - JITTER_LOW) * u
+
+
+def score_income_columns(cols: dict, jitter: np.ndarray) -> np.ndarray:
+    """Unrounded monthly income estimates for a batch of columns."""
+    # 1. Base earnings: explicit financial inputs, or hours × hourly rate
+    explicit_calc = (cols["base_pay_total"] + cols["tips_total"] + cols["bonus_earned"]
+                     + cols["surge_earnings"] + cols["incentives_received"] - cols["deductions"])
+
+    hourly_rate = (100 + _lookup(cols["vehicle_type"], VEHICLE_RATE, 0)
+                   + _lookup(cols["skill_level"], SKILL_RATE, 0))
+    hourly_rate = hourly_rate + cols["years_of_experience"] * 5
+    hours = cols["total_hours_worked_month"]
+    anchor = np.where(explicit_calc > 1000, explicit_calc, hours * hourly_rate)
+
+    # 2. Performance & demand multipliers
+    perf_mult = 1.0 + (cols["acceptance_rate"] - 0.8) * 0.5
+    perf_mult = perf_mult - cols["cancellation_rate"] * 1.0
+    perf_mult = perf_mult + (cols["avg_rating"] - 4.5) * 0.1
+    level_bonus = _lookup(cols["platform_level"], PLATFORM_BONUS, 0.0)
+    perf_mult = np.where(level_bonus != 0, perf_mult + level_bonus, perf_mult)
+    demand = cols["demand_index"]
+    perf_mult = perf_mult * np.where(demand > 0.5, demand, 0.5)
+
+    expected_income = anchor * np.where(perf_mult > 0.6, perf_mult, 0.6)
+
+    # 3. Jitter, then a sensible minimum based on hours worked
+    final_income = expected_income * (1 + jitter)
+    min_income = np.where(hours * 40 > 3000, hours * 40, 3000.0)
+    return np.where(final_income > min_income, final_income, min_income)
+
+
+def predict_incomes(cols: dict, rng: Optional[random.Random] = None) -> list:
+    """Rounded predictions (2 dp, Python rounding) for a batch of columns."""
+    n = len(cols["total_hours_worked_month"])
+    incomes = score_income_columns(cols, draw_jitter(n, rng or random.Random()))
+    return [round(v, 2) for v in incomes.tolist()]
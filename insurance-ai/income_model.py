@@ -0,0 +1,153 @@
+"""
+Income Model
+Batched inference with the trained gig_income_model.pkl.
+
+At load time the model's expected features are inspected once and the
+categorical encodings (platform, city, vehicle_type, season, ...) are compiled
+into lookup tables:
+
+  - label-encoded bundles  {"model": est, "encoders": {col: LabelEncoder}, "features": [...]}
+  - one-hot models fitted on pd.get_dummies frames (feature names like "city_Mumbai")
+
+A whole batch is then encoded column-wise and predicted with a single
+model.predict call. Rows with a categorical value outside the training
+vocabulary are scored by the heuristic instead; the caller gets a per-row
+engine label.
+"""
+
+import os
+import pickle
+import random
+from typing import Optional
+
+import numpy as np
+
+from income_engine import columns_from_profiles
+from income_pool import score_incomes
+
+CATEGORICAL_FEATURES = (
+    "platform", "gender", "city", "area_type", "primary_skill", "skill_level",
+    "education_level", "vehicle_type", "fuel_type", "platform_level",
+    "season", "weather_condition",
+)
+
+_CATEGORICAL_BY_LENGTH = sorted(CATEGORICAL_FEATURES, key=len, reverse=True)
+
+INCOME_ENGINES = ("heuristic", "model")
+INCOME_ENGINE = os.getenv("INCOME_ENGINE", "heuristic")   # heuristic | model
+
+
+class IncomeModel:
+    def __init__(self, obj, numeric_fields=()):
+        """`numeric_fields` are input columns that are never one-hot encoded (e.g. platform_hours_ratio)."""
+        bundle = obj if isinstance(obj, dict) else {"model": obj}
+        self.model = bundle["model"]
+        encoders = bundle.get("encoders", {})
+        features = bundle.get("features")
+        if features is None:
+            features = getattr(self.model, "feature_names_in_", None)
+        if features is None:
+            raise ValueError("model does not expose its feature names")
+        self.features = [str(f) for f in features]
+
+        # Feature plan: one entry per model input column, in model order
+        #   ("numeric", col) | ("label", col, {value: code}) | ("onehot", col, value)
+        self.plan = []
+        self.vocab = {}
+        for f in self.features:
+            if f in encoders:
+                table = {str(v): i for i, v in enumerate(encoders[f].classes_)}
+                self.plan.append(("label", f, table))
+                self.vocab[f] = set(table)
+                continue
+            col = None
+            if f not in numeric_fields:
+                # Longest prefix first: "platform_level_gold" is platform_level, not platform
+                col = next((c for c in _CATEGORICAL_BY_LENGTH if f.startswith(c + "_")), None)
+            if col is not None:
+                value = f[len(col) + 1:]
+                self.plan.append(("onehot", col, value))
+                self.vocab.setdefault(col, set()).add(value)
+            else:
+                self.plan.append(("numeric", f))
+        # Input columns the model reads (beyond what the heuristic needs)
+        self.columns = list(dict.fromkeys(entry[1] for entry in self.plan))
+
+    def encode(self, cols: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Feature matrix for the batch and a mask of rows fully inside the vocabulary."""
+        n = len(cols["total_hours_worked_month"])
+        in_vocab = np.ones(n, dtype=bool)
+        codes = {}
+        for col, vocab in self.vocab.items():
+            # One dict lookup per distinct value, then broadcast back to rows
+            uniq, inverse = np.unique(np.asarray(cols[col]).astype(str), return_inverse=True)
+            known = np.array([u in vocab for u in uniq], dtype=bool)
+            in_vocab &= known[inverse]
+            codes[col] = (uniq, inverse)
+
+        X = np.empty((n, len(self.plan)), dtype=np.float64)
+        for j, entry in enumerate(self.plan):
+            kind, col = entry[0], entry[1]
+            if kind == "numeric":
+                X[:, j] = cols[col]
+            elif kind == "label":
+                uniq, inverse = codes[col]
+                X[:, j] = np.array([entry[2].get(u, -1) for u in uniq], dtype=np.float64)[inverse]
+            else:
+                uniq, inverse = codes[col]
+                X[:, j] = (uniq == entry[2]).astype(np.float64)[inverse]
+        return X, in_vocab
+
+    def predict(self, cols: dict) -> tuple[np.ndarray, np.ndarray]:
+        X, in_vocab = self.encode(cols)
+        preds = np.full(len(in_vocab), np.nan)
+        if in_vocab.any():
+            preds[in_vocab] = self.model.predict(X[in_vocab])
+        return preds, in_vocab
+
+
+def model_columns_from_profiles(profiles: list, model: IncomeModel) -> dict:
+    """Heuristic columns plus every column the model reads."""
+    cols = columns_from_profiles(profiles)
+    for f in model.columns:
+        if f not in cols:
+            dtype = object if f in CATEGORICAL_FEATURES else np.float64
+            cols[f] = np.array([getattr(p, f) for p in profiles], dtype=dtype)
+    return cols
+
+
+def resolve_engine(engine: Optional[str]) -> str:
+    engine = engine or INCOME_ENGINE
+    if engine not in INCOME_ENGINES:
+        raise ValueError(f"unknown engine '{engine}' (expected one of {', '.join(INCOME_ENGINES)})")
+    return engine
+
+
+def load_income_model(path: str, numeric_fields=()) -> IncomeModel:
+    with open(path, "rb") as f:
+        return IncomeModel(pickle.load(f), numeric_fields)
+
+
+def predict_with_engine(
+    cols: dict, rng: Optional[random.Random], engine: str, model: Optional[IncomeModel],
+) -> tuple[list, Optional[list]]:
+    """
+    Predictions plus per-row engine labels (None when the heuristic engine
+    was asked for). Out-of-vocabulary rows fall back to the heuristic, and so
+    does the whole batch while the model is missing or still loading.
+    """
+    if engine != "model":
+        return score_incomes(cols, rng), None
+    if model is None:
+        results = score_incomes(cols, rng)
+        return results, ["heuristic"] * len(results)
+
+    preds, in_vocab = model.predict(cols)
+    results = [round(v, 2) for v in preds.tolist()]
+    engines = np.where(in_vocab, "model", "heuristic").tolist()
+    fallback = np.flatnonzero(~in_vocab)
+    if len(fallback):
+        subset = {k: v[fallback] for k, v in cols.items()}
+        for i, v in zip(fallback.tolist(), score_incomes(subset, rng)):
+            results[i] = v
+    return results, engines
@@ -0,0 +1,85 @@
+"""
+Income Pool
+Multi-core execution of large /predict_income batches.
+
+Batches of at least INCOME_POOL_MIN_ROWS rows are split into shards of
+INCOME_POOL_SHARD_ROWS and scored in a persistent process pool started in
+the app lifespan. Smaller batches stay in-process to avoid IPC overhead.
+Jitter is drawn for the whole batch in the parent before sharding, so the
+result (reassembled in input order) is identical to in-process scoring.
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional
+
+from income_engine import (
+    CATEGORICAL_FIELDS,
+    NUMERIC_FIELDS,
+    draw_jitter,
+    predict_incomes,
+    score_income_columns,
+)
+
+INCOME_POOL_WORKERS = int(os.getenv("INCOME_POOL_WORKERS", "0"))       # 0 = disabled
+INCOME_POOL_MIN_ROWS = int(os.getenv("INCOME_POOL_MIN_ROWS", "50000"))
+INCOME_POOL_SHARD_ROWS = int(os.getenv("INCOME_POOL_SHARD_ROWS", "25000"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_workers = 0
+
+
+def _warm_up(_=None) -> int:
+    return os.getpid()
+
+
+def start_pool(workers: int = INCOME_POOL_WORKERS):
+    """Start the worker processes (called from the FastAPI lifespan)."""
+    global _pool, _workers
+    if _pool is None and workers > 0:
+        # spawn: never fork a process that already runs an event loop and threads
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        list(_pool.map(_warm_up, range(workers)))
+        _workers = workers
+
+
+def shutdown_pool():
+    global _pool, _workers
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _workers = 0
+
+
+def _score_shard(shard: tuple) -> list:
+    cols, jitter = shard
+    return [round(v, 2) for v in score_income_columns(cols, jitter).tolist()]
+
+
+def score_incomes(cols: dict, rng: Optional[random.Random] = None) -> list:
+    """Rounded predictions for a batch, sharded across the pool when it is large."""
+    n = len(cols["total_hours_worked_month"])
+    if _pool is None or n < INCOME_POOL_MIN_ROWS:
+        return predict_incomes(cols, rng)
+
+    jitter = draw_jitter(n, rng or random.Random())
+    used = {f: cols[f] for f in (*NUMERIC_FIELDS, *CATEGORICAL_FIELDS)}
+    bounds = range(0, n, INCOME_POOL_SHARD_ROWS)
+    shards = (
+        ({f: col[i:i + INCOME_POOL_SHARD_ROWS] for f, col in used.items()}, jitter[i:i + INCOME_POOL_SHARD_ROWS])
+        for i in bounds
+    )
+    results = []
+    for part in _pool.map(_score_shard, shards):   # map preserves input order
+        results.extend(part)
+    return results
+
+
+def stats() -> dict:
+    return {
+        "workers": _workers,
+        "min_rows": INCOME_POOL_MIN_ROWS,
+        "shard_rows": INCOME_POOL_SHARD_ROWS,
+    }
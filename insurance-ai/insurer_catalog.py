@@ -2,8 +2,15 @@
 Insurer Catalog
 Simulated catalog of real Indian gig-worker insurance plans from 5 providers.
 In production, these would be fetched from each insurer's API.
+
+This list seeds catalog_store; set CATALOG_PATH to serve (and hot-reload)
+a catalog data file instead.
 """
 
+import hashlib
+import json
+from typing import Optional
+
 INSURER_CATALOG = [
 
     # ─── ACKO INSURANCE ──────────────────────────────────────────────────────
@@ -293,3 +300,16 @@ INSURER_CATALOG = [
         "rating": 3.9,
     },
 ]
+
+
+def plan_version(plan: dict) -> str:
+    """Content hash of one plan — changes whenever any of its fields changes."""
+    blob = json.dumps(plan, sort_keys=True, ensure_ascii=False).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def catalog_version(plans: list, plan_versions: Optional[list] = None) -> str:
+    """Content hash of a catalog — changes whenever any plan (or the plan order) changes."""
+    versions = plan_versions if plan_versions is not None else [plan_version(p) for p in plans]
+    return hashlib.sha256(",".join(versions).encode()).hexdigest()[:16]
+
@@ -0,0 +1,180 @@
+"""
+LLM Cache
+Two-tier cache for rank_plans / explain_plan outputs.
+
+  1. MEMORY  – in-process LRU with TTL (always on)
+  2. SQLITE  – optional persistent tier that survives restarts (LLM_CACHE_DB)
+
+Lookups and writes go through aget / aget_many / aset, which run the SQLite
+statements in a worker thread so a lookup or commit never blocks the event
+loop.
+
+Keys are built from a canonical worker-profile fingerprint in which numeric
+fields are bucketed, so near-identical workers (same type, risk class, zone
+and income band) share one LLM answer. Bucket widths are configurable; set a
+width to 0 to key on the exact value.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))   # seconds
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")                 # e.g. llm_cache.sqlite3
+
+# Bucket widths for numeric profile fields (0 = exact value)
+PROFILE_BUCKETS = {
+    "avg_monthly_income": float(os.getenv("CACHE_BUCKET_INCOME", "2500")),
+    "risk_score": float(os.getenv("CACHE_BUCKET_RISK_SCORE", "10")),
+    "work_stability_score": float(os.getenv("CACHE_BUCKET_STABILITY", "10")),
+}
+
+# Categorical profile fields that feed the prompts
+PROFILE_CATEGORIES = ("employment_type", "risk_classification", "location_zone")
+
+
+def _bucket(value, width: float):
+    if value is None:
+        return None
+    if not width:
+        return value
+    return int(float(value) // width)
+
+
+def profile_fingerprint(profile: dict) -> str:
+    """Canonical, bucketed fingerprint of the profile fields the LLM sees."""
+    canonical = {k: str(profile.get(k) or "").lower() for k in PROFILE_CATEGORIES}
+    for field, width in PROFILE_BUCKETS.items():
+        canonical[field] = _bucket(profile.get(field), width)
+    blob = json.dumps(canonical, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()[:20]
+
+
+def make_key(stage: str, profile: dict, catalog_version: str, *parts) -> str:
+    """`catalog_version` is the content hash of the plan(s) the answer depends on."""
+    return ":".join([stage, catalog_version, profile_fingerprint(profile), *map(str, parts)])
+
+
+class LLMCache:
+    """In-process LRU/TTL tier in front of an optional SQLite tier."""
+
+    def __init__(self, max_size: int, ttl: float, db_path: str = ""):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._mem: OrderedDict = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "sqlite_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _mem_put(self, key: str, value, expires_at: float):
+        self._mem[key] = (value, expires_at)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_size:
+            self._mem.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _mem_get(self, key: str, now: float):
+        entry = self._mem.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._mem.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return value
+            del self._mem[key]
+            self.counters["expirations"] += 1
+        return None
+
+    def _db_get(self, keys: list) -> dict:
+        with self._db_lock:
+            return {
+                key: row
+                for key in keys
+                if (row := self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()) is not None
+            }
+
+    def _db_put(self, key: str, encoded: str, expires_at: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, encoded, expires_at),
+            )
+            self._db.commit()
+
+    def _promote(self, key: str, row, now: float):
+        if row and row[1] > now:
+            value = json.loads(row[0])
+            self._mem_put(key, value, row[1])
+            self.counters["sqlite_hits"] += 1
+            return value
+        self.counters["misses"] += 1
+        return None
+
+    async def aget_many(self, keys: list) -> list:
+        """Cached value (or None) for each key; SQLite lookups run in one worker thread, off the event loop."""
+        now = time.time()
+        values = [self._mem_get(key, now) for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is None]
+        rows = await asyncio.to_thread(self._db_get, missing) if missing and self._db is not None else {}
+        return [
+            value if value is not None else self._promote(key, rows.get(key), now)
+            for key, value in zip(keys, values)
+        ]
+
+    async def aget(self, key: str):
+        return (await self.aget_many([key]))[0]
+
+    async def aset(self, key: str, value):
+        """Store in memory now; the SQLite write runs in a worker thread, off the event loop."""
+        expires_at = time.time() + self.ttl
+        self._mem_put(key, value, expires_at)
+        self.counters["sets"] += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, key, json.dumps(value, ensure_ascii=False), expires_at)
+
+    def clear(self):
+        self._mem.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["sqlite_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._mem),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "sqlite_enabled": self._db is not None,
+            "buckets": PROFILE_BUCKETS,
+        }
+
+
+llm_cache = LLMCache(LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_DB)
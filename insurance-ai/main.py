@@ -8,31 +8,141 @@ Endpoints:
   POST /recommend        — AI-ranked + explained plan recommendations
 """
 
+from startup import STARTUP_MODE, startup
+
+import asyncio
 import os
+import random
+import time
+from contextlib import aclosing, asynccontextmanager
 from typing import Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 import uvicorn
 from dotenv import load_dotenv
 
-import pickle
-import pandas as pd
 import warnings
 
 warnings.filterwarnings('ignore')
+startup.mark("web_framework")
+
+# Importing catalog_store builds the initial catalog snapshot
+from catalog_store import CATALOG_RELOAD_INTERVAL, CatalogSnapshot, catalog_store
+startup.mark("catalog_snapshot")
+
+from admission import (
+    AdmissionController,
+    ADMISSION_ADAPTIVE,
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_MS,
+)
+from ai_recommender import (
+    ExplainMode,
+    close_client,
+    explain_mode_setting,
+    get_fallback_recommendations,
+    get_recommendations,
+    get_recommendations_batch,
+    init_client,
+    stream_recommendations,
+)
+from catalog_responses import dumps, respond
+from catalog_sync import catalog_sync
+from circuit_breaker import llm_breaker
+from distilled_ranker import RANK_MODE, distilled_ranker, rank_log
+from income_engine import columns_from_profiles
+from income_model import load_income_model, model_columns_from_profiles, predict_with_engine, resolve_engine
+from income_pool import shutdown_pool, start_pool
+import income_pool
+from income_ingest import (
+    ARROW_CONTENT_TYPES,
+    ColumnError,
+    column_schema,
+    iter_column_chunks,
+    parse_arrow,
+    parse_csv,
+    parse_json_columns,
+    validate_columns,
+)
+from llm_cache import llm_cache
+from metrics import TimingMiddleware, collector, fallbacks, record_income_rows, span
+from metrics import render as render_metrics
+from quota_scheduler import llm_priority, llm_scheduler
+from rate_limiter import llm_limiter
+from recommendation_store import profile_hash, recommendation_store
+from singleflight import llm_inflight
+from token_meter import llm_tokens
+
+startup.mark("service_modules")
+load_dotenv()
+
+# Bounds how many /recommend calls wait on the LLM; overflow is served rule-based
+recommend_admission = AdmissionController(
+    limit=ADMISSION_MAX_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+    adaptive=ADMISSION_ADAPTIVE,
+    latency_source=llm_breaker.current_latency,
+)
 
-from insurer_catalog import INSURER_CATALOG
-from ai_recommender import get_recommendations
 
-load_dotenv()
+def _load_income_model():
+    global income_model
+    # Feature encodings are compiled into lookup tables once, here.
+    # A missing/unusable model marks the phase failed; the heuristic still serves.
+    income_model = load_income_model(MODEL_PATH, INCOME_NUMERIC_FIELDS)
+
+
+async def _warm_up():
+    # Shared pooled Groq connection for the lifetime of the worker
+    await startup.run_phase("groq_client", init_client, blocking=False)
+    # Trained income model (unpickling pulls in scikit-learn)
+    await startup.run_phase("income_model", _load_income_model)
+    # Process pool for large /predict_income batches (INCOME_POOL_WORKERS > 0)
+    await startup.run_phase("income_pool", start_pool)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for phase in ("groq_client", "income_model", "income_pool"):
+        startup.add_phase(phase)
+    warm_up = None
+    if STARTUP_MODE == "eager":
+        await _warm_up()
+    else:
+        # Start listening now; until the phases finish, requests take the
+        # lazy paths (client opened on first LLM call, heuristic income engine)
+        warm_up = asyncio.create_task(_warm_up())
+    # Hot-swap the catalog when CATALOG_PATH changes on disk
+    tasks = [t for t in (warm_up,) if t is not None]
+    if catalog_store.path and CATALOG_RELOAD_INTERVAL > 0:
+        tasks.append(asyncio.create_task(catalog_store.watch()))
+    # Pull insurer feeds (CATALOG_FEEDS) and apply plan-level diffs
+    if catalog_sync.feeds:
+        tasks.append(asyncio.create_task(catalog_sync.run()))
+    startup.listening_at = time.perf_counter()
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_client()
+    await run_in_threadpool(shutdown_pool)
+
 
 app = FastAPI(
     title="GigShield Insurance AI Service",
     description="AI-powered insurance plan recommender for gig workers",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Stage timings → Server-Timing header and /metrics histograms
+app.add_middleware(TimingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origin_regex=".*",  # Allows all origins dynamically
@@ -55,6 +165,8 @@ class WorkerProfile(BaseModel):
     active_days_per_month: Optional[int] = Field(22)
     has_dependents: Optional[bool] = Field(False)
     top_n: Optional[int] = Field(3, ge=1, le=5, description="Number of recommendations to return")
+    explain_mode: Optional[ExplainMode] = Field(None, description="individual | batch (defaults to EXPLAIN_MODE env)")
+    deadline_ms: Optional[int] = Field(None, ge=0, le=60000, description="Time budget for the AI pipeline (defaults to RECOMMEND_DEADLINE_MS env)")
 
 
 class FilterParams(BaseModel):
@@ -66,12 +178,8 @@ class FilterParams(BaseModel):
 # ── Load Income Prediction Model & Schema ─────────────────────────────────────
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "gig_income_model.pkl")
-try:
-    with open(MODEL_PATH, "rb") as f:
-        income_model = pickle.load(f)
-except Exception as e:
-    print(f"Warning: Could not load income prediction model: {e}")
-    income_model = None
+# Loaded by the startup warm-up (see lifespan); None until then
+income_model = None
 
 class GigWorkerIncomeData(BaseModel):
     platform: str = "Swiggy"
@@ -118,34 +226,187 @@ class GigWorkerIncomeData(BaseModel):
 
 @app.get("/health")
 def health_check():
+    """Liveness (always "ok" once the server answers) plus warm-up readiness."""
     return {
         "status": "ok",
+        "ready": startup.ready,
+        "phases": {name: p["state"] for name, p in startup.phases.items()},
         "service": "GigShield Insurance AI",
-        "plans_in_catalog": len(INSURER_CATALOG),
+        "plans_in_catalog": len(catalog_store.snapshot.plans),
+        "catalog_version": catalog_store.version,
         "gemini_configured": bool(os.getenv("GEMINI_API_KEY")),
     }
 
 
+@app.get("/health/ready")
+def readiness_check():
+    """503 until every warm-up phase has finished (for readiness probes)."""
+    return JSONResponse(startup.report(), status_code=200 if startup.ready else 503)
+
+
+@app.get("/startup")
+def startup_report():
+    """Import timings, time-to-listen and per-phase warm-up durations."""
+    return startup.report()
+
+
+@app.get("/stats")
+def get_stats():
+    """Runtime counters for tuning the LLM pipeline (admission, cache, tokens, rate limiter, coalescing, breaker)."""
+    return {
+        "admission": recommend_admission.stats(),
+        "catalog": catalog_store.stats(),
+        "catalog_sync": catalog_sync.stats(),
+        "circuit_breaker": llm_breaker.stats(),
+        "distilled_ranker": {
+            "mode": RANK_MODE,
+            "model": distilled_ranker.stats() if distilled_ranker else None,
+            "logged_rows": rank_log.rows if rank_log else None,
+        },
+        "income_pool": income_pool.stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm_tokens": llm_tokens.stats(),
+        "quota": llm_scheduler.stats(),
+        "rate_limiter": llm_limiter.stats(),
+        "recommendation_store": recommendation_store.stats() if recommendation_store else None,
+        "single_flight": llm_inflight.stats(),
+    }
+
+
+@collector
+def _pipeline_counters() -> list:
+    """Counters kept by the pipeline modules, read at scrape time."""
+    breaker = llm_breaker.stats()
+    quota = llm_scheduler.stats()
+    token_stages = llm_tokens.stats()["stages"]
+    series = [
+        ("llm_cache_events_total", "counter", "LLM cache lookups and writes by outcome",
+         {(k,): v for k, v in llm_cache.counters.items()}, ("event",)),
+        ("single_flight_total", "counter", "LLM calls started vs. joined an identical in-flight call",
+         {("leader",): llm_inflight.leaders, ("collapsed",): llm_inflight.collapsed}, ("role",)),
+        ("circuit_breaker_open", "gauge", "1 while the LLM circuit breaker is open",
+         {(): int(breaker["state"] == "open")}, ()),
+        ("llm_tokens_total", "counter", "Prompt and completion tokens by pipeline stage",
+         {(stage, kind): s[f"{kind}_tokens"] for stage, s in token_stages.items() for kind in ("prompt", "completion")},
+         ("stage", "kind")),
+        ("quota_remaining_today", "gauge", "LLM calls left in today's provider quota", {(): quota["remaining_today"]}, ()),
+        ("quota_queued", "gauge", "LLM calls waiting for a slot by priority class",
+         {(name,): c["queued"] for name, c in quota["classes"].items()}, ("priority",)),
+        ("admission_in_flight", "gauge", "/recommend calls running the AI pipeline",
+         {(): recommend_admission.active}, ()),
+    ]
+    if recommendation_store is not None:
+        series.append(("recommendation_store_lookups_total", "counter", "Precomputed recommendation lookups by outcome",
+                       {(k,): v for k, v in recommendation_store.counters.items()}, ("outcome",)))
+    if distilled_ranker is not None:
+        series.append(("distilled_rankings_total", "counter", "Stage-1 rankings served locally vs. sent to the LLM",
+                       {("local",): distilled_ranker.counters["served_local"],
+                        ("llm",): distilled_ranker.counters["llm_fallbacks"]}, ("path",)))
+    return series
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition: stage / request / LLM latency histograms and pipeline counters."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/catalog")
 def get_catalog(
+    request: Request,
     category: Optional[str] = None,
     employment_type: Optional[str] = None,
     max_daily_premium: Optional[float] = None,
+    min_coverage: Optional[float] = None,
+    provider: Optional[str] = None,
 ):
     """Return the full insurance product catalog with optional filters."""
-    plans = INSURER_CATALOG.copy()
+    cached = catalog_store.snapshot.responses.catalog(
+        category=category or None,
+        employment_type=employment_type or None,
+        provider=provider or None,
+        max_daily_premium=max_daily_premium or None,
+        min_coverage=min_coverage or None,
+    )
+    return respond(request, cached)
+
+
+@app.post("/catalog/reload")
+async def reload_catalog():
+    """Re-read CATALOG_PATH now and swap in the new snapshot if it changed."""
+    if not catalog_store.path:
+        raise HTTPException(status_code=409, detail="CATALOG_PATH is not configured")
+    errors = catalog_store.errors
+    changed = await run_in_threadpool(catalog_store.reload, True)
+    if catalog_store.errors > errors:
+        raise HTTPException(status_code=422, detail=f"Catalog not reloaded: {catalog_store.last_error}")
+    return {"success": True, "changed": changed, **catalog_store.stats()}
+
+
+def _eligible_plans(catalog: CatalogSnapshot, employment_type: str) -> list:
+    # Plans targeting this worker type or open to freelancers (whole catalog if none)
+    return catalog.index.eligible(employment_type)
+
+
+DISCLAIMER = (
+    "GigShield is an insurance intermediary platform. "
+    "All plans are underwritten by their respective IRDAI-registered insurers. "
+    "Final premium may vary at purchase."
+)
+
+
+_DEGRADED_CAUSES = {
+    "overload": "service under high load",
+    "quota": "daily AI quota used up",
+}
+
 
-    if category:
-        plans = [p for p in plans if p["category"] == category]
-    if employment_type:
-        plans = [p for p in plans if employment_type in p.get("target_workers", [])]
-    if max_daily_premium:
-        plans = [p for p in plans if p["premium"]["per_day"] <= max_daily_premium]
+def _methodology(degraded_reason: Optional[str] = None) -> dict:
+    if degraded_reason:
+        return {
+            "mode": "degraded",
+            "reason": degraded_reason,
+            "stage_1": f"Rule-based scoring ({_DEGRADED_CAUSES.get(degraded_reason, degraded_reason)}, AI ranking skipped)",
+            "stage_2": "Template explanation per top plan (AI explanation skipped)",
+        }
+    return {
+        "mode": "ai",
+        "stage_1": "Gemini 1.5 Flash scored each plan 0-100 based on worker profile match",
+        "stage_2": "Gemini generated personalised plain-English explanation per top plan",
+        "fallback": "Rule-based scoring used if Gemini API unavailable",
+    }
+
+
+def _serialized(payload: dict) -> Response:
+    with span("serialize"):
+        return Response(dumps(payload), media_type="application/json")
 
+
+def _worker_profile(profile: WorkerProfile) -> dict:
+    return {
+        "employment_type": profile.employment_type,
+        "risk_classification": profile.risk_classification,
+        "risk_score": profile.risk_score,
+        "avg_monthly_income": profile.avg_monthly_income,
+        "location_zone": profile.location_zone,
+    }
+
+
+def _recommend_response(
+    profile: WorkerProfile,
+    recommendations: list,
+    eligible_plans: list,
+    catalog: CatalogSnapshot,
+    degraded_reason: Optional[str] = None,
+) -> dict:
     return {
-        "total": len(plans),
-        "plans": plans,
-        "providers": list({p["provider"] for p in plans}),
+        "success": True,
+        "worker_profile": _worker_profile(profile),
+        "recommendations": recommendations,
+        "total_plans_evaluated": len(eligible_plans),
+        "catalog_version": catalog.version,
+        "methodology": _methodology(degraded_reason),
+        "disclaimer": DISCLAIMER,
     }
 
 
@@ -159,157 +420,276 @@ async def recommend(profile: WorkerProfile):
     2. Uses Gemini to rank all plans by match score
     3. Generates plain-English explanation for top N plans
     4. Returns enriched recommendation cards
+
+    Under overload (concurrency limit and queue full), or once the daily LLM
+    quota is used up, the request is served instantly from the rule-based
+    path and flagged as degraded.
     """
     try:
-        # Filter catalog by employment type first
-        eligible_plans = [
-            p for p in INSURER_CATALOG
-            if profile.employment_type in p.get("target_workers", [])
-               or "freelancer" in p.get("target_workers", [])
-        ]
-
-        if not eligible_plans:
-            eligible_plans = INSURER_CATALOG  # fallback: show all
+        # One snapshot for the whole request, even if the catalog is reloaded meanwhile
+        catalog = catalog_store.snapshot
+        with span("eligibility"):
+            eligible_plans = _eligible_plans(catalog, profile.employment_type)
 
         # Build profile dict for AI
         profile_dict = profile.model_dump()
         profile_dict["avg_monthly_income"] = profile.avg_monthly_income
 
-        # Run AI pipeline
-        recommendations = await get_recommendations(
-            profile=profile_dict,
-            plans=eligible_plans,
-            top_n=profile.top_n or 3,
-        )
+        # Returning worker with an unchanged profile: serve the precomputed result
+        if recommendation_store is not None:
+            with span("store_lookup"):
+                stored = await run_in_threadpool(
+                    recommendation_store.get, profile.user_id, profile_hash(profile_dict), catalog.version,
+                )
+            if stored is not None:
+                return _serialized({**_recommend_response(profile, stored, eligible_plans, catalog), "precomputed": True})
+
+        if not llm_scheduler.admits():
+            fallbacks.inc(("quota",))
+            recommendations = get_fallback_recommendations(
+                profile=profile_dict, plans=eligible_plans, top_n=profile.top_n or 3, catalog=catalog,
+            )
+            return _serialized(_recommend_response(profile, recommendations, eligible_plans, catalog, degraded_reason="quota"))
+
+        with span("admission"):
+            admitted = await recommend_admission.acquire()
+        if not admitted:
+            fallbacks.inc(("overload",))
+            recommendations = get_fallback_recommendations(
+                profile=profile_dict, plans=eligible_plans, top_n=profile.top_n or 3, catalog=catalog,
+            )
+            return _serialized(_recommend_response(profile, recommendations, eligible_plans, catalog, degraded_reason="overload"))
+
+        try:
+            # Run AI pipeline
+            recommendations = await get_recommendations(
+                profile=profile_dict,
+                plans=eligible_plans,
+                top_n=profile.top_n or 3,
+                explain_mode=profile.explain_mode,
+                deadline_ms=profile.deadline_ms,
+                catalog=catalog,
+            )
+        finally:
+            recommend_admission.release()
+
+        return _serialized(_recommend_response(profile, recommendations, eligible_plans, catalog))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Recommendation engine error: {str(e)}")
 
-        # Build response
-        return {
-            "success": True,
-            "worker_profile": {
-                "employment_type": profile.employment_type,
-                "risk_classification": profile.risk_classification,
-                "risk_score": profile.risk_score,
-                "avg_monthly_income": profile.avg_monthly_income,
-                "location_zone": profile.location_zone,
-            },
-            "recommendations": recommendations,
-            "total_plans_evaluated": len(eligible_plans),
-            "methodology": {
-                "stage_1": "Gemini 1.5 Flash scored each plan 0-100 based on worker profile match",
-                "stage_2": "Gemini generated personalised plain-English explanation per top plan",
-                "fallback": "Rule-based scoring used if Gemini API unavailable",
-            },
-            "disclaimer": (
-                "GigShield is an insurance intermediary platform. "
-                "All plans are underwritten by their respective IRDAI-registered insurers. "
-                "Final premium may vary at purchase."
-            ),
-        }
 
+RECOMMEND_BATCH_MAX_PROFILES = int(os.getenv("RECOMMEND_BATCH_MAX_PROFILES", "500"))
+RECOMMEND_BATCH_DEADLINE_MS = int(os.getenv("RECOMMEND_BATCH_DEADLINE_MS", "60000"))
+# One explanation call per bucket (not per plan) keeps cohort runs inside the quota
+RECOMMEND_BATCH_EXPLAIN_MODE = explain_mode_setting("RECOMMEND_BATCH_EXPLAIN_MODE", "batch")
+
+
+class RecommendBatchRequest(BaseModel):
+    profiles: list[WorkerProfile]
+    explain_mode: Optional[ExplainMode] = Field(None, description="individual | batch (defaults to RECOMMEND_BATCH_EXPLAIN_MODE env)")
+    deadline_ms: Optional[int] = Field(None, ge=0, le=300000, description="Time budget for the whole cohort (defaults to RECOMMEND_BATCH_DEADLINE_MS env)")
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(data: RecommendBatchRequest):
+    """
+    Recommendations for a whole cohort in one call, keyed by user_id.
+
+    Workers in the same cache bucket and eligibility set share one pipeline
+    run, and several buckets are ranked per LLM prompt; see
+    ai_recommender.get_recommendations_batch. The cohort takes one admission
+    slot; when shed, every worker gets the rule-based result. Its LLM calls
+    run at "batch" priority, behind interactive traffic, and the cohort is
+    served rule-based once the remaining daily quota is reserved for
+    interactive calls.
+    """
+    if len(data.profiles) > RECOMMEND_BATCH_MAX_PROFILES:
+        raise HTTPException(status_code=422, detail=f"At most {RECOMMEND_BATCH_MAX_PROFILES} profiles per batch")
+    user_ids = [p.user_id for p in data.profiles]
+    if len(set(user_ids)) != len(user_ids):
+        raise HTTPException(status_code=422, detail="user_id values must be unique within a batch")
+
+    catalog = catalog_store.snapshot
+    profile_dicts = [p.model_dump() for p in data.profiles]
+    plan_sets = [_eligible_plans(catalog, p.employment_type) for p in data.profiles]
+    top_ns = [p.top_n or 3 for p in data.profiles]
+
+    priority = llm_priority.set("batch")
+    try:
+        if not llm_scheduler.admits():
+            degraded = "quota"
+        elif not await recommend_admission.acquire():
+            degraded = "overload"
+        else:
+            degraded = None
+        if degraded:
+            fallbacks.inc((degraded,), len(profile_dicts))
+            results = [
+                get_fallback_recommendations(profile=p, plans=plans, top_n=n, catalog=catalog)
+                for p, plans, n in zip(profile_dicts, plan_sets, top_ns)
+            ]
+            stats = {"profiles": len(results), "groups": len(results), "rank_batches": 0, "degraded": user_ids}
+        else:
+            try:
+                results, stats = await get_recommendations_batch(
+                    profile_dicts, plan_sets, top_ns,
+                    explain_mode=data.explain_mode or RECOMMEND_BATCH_EXPLAIN_MODE,
+                    deadline_ms=data.deadline_ms if data.deadline_ms is not None else RECOMMEND_BATCH_DEADLINE_MS,
+                    catalog=catalog,
+                )
+                stats["degraded"] = [user_ids[i] for i in stats["degraded"]]
+            finally:
+                recommend_admission.release()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recommendation engine error: {str(e)}")
+    finally:
+        llm_priority.reset(priority)
+
+    return {
+        "success": True,
+        "results": {
+            profile.user_id: {
+                "worker_profile": _worker_profile(profile),
+                "recommendations": recommendations,
+                "total_plans_evaluated": len(plans),
+            }
+            for profile, recommendations, plans in zip(data.profiles, results, plan_sets)
+        },
+        "batch": stats,
+        "catalog_version": catalog.version,
+        "methodology": _methodology(degraded),
+        "disclaimer": DISCLAIMER,
+    }
+
+
+def _stream_frame(fmt: str, event: str, data: dict) -> bytes:
+    if fmt == "ndjson":
+        return dumps({"event": event, "data": data}) + b"\n"
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+@app.post("/recommend/stream")
+async def recommend_stream(
+    profile: WorkerProfile, request: Request, format: Optional[str] = None, stream_tokens: bool = False,
+):
+    """
+    Streaming /recommend: Server-Sent Events (default) or NDJSON
+    (format=ndjson or Accept: application/x-ndjson).
+
+      rankings     – the full /recommend envelope with ranked cards, sent as soon as
+                     stage 1 finishes (ai_explanation is null until its event arrives)
+      token        – explanation text deltas per plan (stream_tokens=true)
+      explanation  – {"rank", "plan_id", "ai_explanation"} as each explanation completes
+      done         – {"success": true}; {"success": false, "error"} on failure
+    """
+    fmt = format or ("ndjson" if "application/x-ndjson" in request.headers.get("accept", "") else "sse")
+    if fmt not in ("sse", "ndjson"):
+        raise HTTPException(status_code=422, detail="format must be sse or ndjson")
+
+    catalog = catalog_store.snapshot
+    eligible_plans = _eligible_plans(catalog, profile.employment_type)
+    profile_dict = profile.model_dump()
+    profile_dict["avg_monthly_income"] = profile.avg_monthly_income
+    top_n = profile.top_n or 3
+
+    async def _events():
+        try:
+            if not llm_scheduler.admits():
+                degraded = "quota"
+            elif not await recommend_admission.acquire():
+                degraded = "overload"
+            else:
+                degraded = None
+            if degraded:
+                fallbacks.inc((degraded,))
+                recommendations = get_fallback_recommendations(
+                    profile=profile_dict, plans=eligible_plans, top_n=top_n, catalog=catalog,
+                )
+                yield _stream_frame(fmt, "rankings", _recommend_response(
+                    profile, recommendations, eligible_plans, catalog, degraded_reason=degraded,
+                ))
+                yield _stream_frame(fmt, "done", {"success": True})
+                return
+            try:
+                # Close the pipeline here, in this request's context, rather than in the asyncgen finalizer
+                async with aclosing(stream_recommendations(
+                    profile=profile_dict,
+                    plans=eligible_plans,
+                    top_n=top_n,
+                    explain_mode=profile.explain_mode,
+                    deadline_ms=profile.deadline_ms,
+                    catalog=catalog,
+                    stream_tokens=stream_tokens,
+                )) as events:
+                    async for event, data in events:
+                        if event == "rankings":
+                            data = _recommend_response(profile, data["recommendations"], eligible_plans, catalog)
+                        yield _stream_frame(fmt, event, data)
+            finally:
+                recommend_admission.release()
+            yield _stream_frame(fmt, "done", {"success": True})
+        except Exception as e:
+            yield _stream_frame(fmt, "done", {"success": False, "error": f"Recommendation engine error: {str(e)}"})
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/event-stream"
+    return StreamingResponse(_events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.get("/providers")
-def get_providers():
+def get_providers(request: Request):
     """List all insurance providers in the catalog."""
-    providers = {}
-    for p in INSURER_CATALOG:
-        prov = p["provider"]
-        if prov not in providers:
-            providers[prov] = {
-                "name": prov,
-                "logo": p["provider_logo"],
-                "irdai_registered": p["irdai_registered"],
-                "rating": p["rating"],
-                "plan_count": 0,
-                "website": p["provider_website"],
-            }
-        providers[prov]["plan_count"] += 1
-
-    return {"providers": list(providers.values())}
+    return respond(request, catalog_store.snapshot.responses.providers)
 
 
 class IncomeBatchRequest(BaseModel):
     profiles: list[GigWorkerIncomeData]
+    seed: Optional[int] = Field(None, description="Fix the jitter RNG for reproducible predictions")
+    engine: Optional[str] = Field(None, description="heuristic | model (defaults to INCOME_ENGINE env)")
+
+
+def _income_response(results: list, engines: Optional[list]) -> dict:
+    response = {
+        "success": True,
+        "predictions": results,
+        "total_estimated_income": round(sum(results), 2)
+    }
+    if engines is not None:
+        response["engines"] = engines
+    return response
+
+
+def _predict_income_rows(endpoint: str, cols: dict, rng, engine: str) -> tuple[list, Optional[list]]:
+    start = time.perf_counter()
+    results, engines = predict_with_engine(cols, rng, engine, income_model)
+    record_income_rows(endpoint, len(results), time.perf_counter() - start)
+    return results, engines
+
 
 @app.post("/predict_income")
 def predict_income(data: IncomeBatchRequest):
     """
     Predict gig worker monthly income based on input features using a sensible heuristic model with dynamic randomization.
+    The whole batch is scored column-wise by income_engine (vectorized), or by
+    the trained model when engine="model" (one batched predict call; rows it
+    cannot encode fall back to the heuristic and are labelled in "engines").
     """
-    import random
-    
+    try:
+        engine = resolve_engine(data.engine)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     try:
         if not data.profiles:
             return {"success": True, "predictions": [], "total_estimated_income": 0}
 
-        results = []
-        for profile in data.profiles:
-            # 1. Base Earnings Calculation based on explicit financial inputs
-            explicit_calc = (profile.base_pay_total + profile.tips_total + 
-                             profile.bonus_earned + profile.surge_earnings + 
-                             profile.incentives_received - profile.deductions)
-            
-            # If explicit financial inputs are reasonably large (e.g. > 1000), use them as the primary anchor
-            if explicit_calc > 1000:
-                anchor = explicit_calc
-            else:
-                # Fallback heuristic: Estimated Hours * Hourly Rate (dependent on skill/exp/vehicle)
-                hourly_rate = 100 # Base INR/hr
-                
-                # Adjust for platform/vehicle
-                if profile.vehicle_type == "car":
-                    hourly_rate += 50
-                elif profile.vehicle_type == "bike":
-                    hourly_rate += 30
-                    
-                # Adjust for skill/experience
-                if profile.skill_level == "expert":
-                    hourly_rate += 40
-                elif profile.skill_level == "intermediate":
-                    hourly_rate += 20
-                    
-                hourly_rate += (profile.years_of_experience * 5)
-                
-                anchor = profile.total_hours_worked_month * hourly_rate
-                
-            # 2. Apply Performance & Demand Multipliers
-            perf_mult = 1.0
-            
-            # Acceptance & Cancellation
-            perf_mult += (profile.acceptance_rate - 0.8) * 0.5 # Reward high acceptance (>80%)
-            perf_mult -= (profile.cancellation_rate) * 1.0     # Punish cancellation heavily
-            
-            # Ratings
-            perf_mult += (profile.avg_rating - 4.5) * 0.1      # Reward high rating
-            
-            # Platform Level
-            if profile.platform_level in ["diamond", "platinum"]:
-                perf_mult += 0.15
-            elif profile.platform_level == "gold":
-                perf_mult += 0.10
-                
-            # Demand Index (baseline usually 0.8-1.0)
-            perf_mult *= max(0.5, profile.demand_index) # Prevent multiplying by negative or zero
-            
-            # Ensure multiplier doesn't drop too low for active workers
-            expected_income = anchor * max(0.6, perf_mult)
-            
-            # 3. Add dynamic, sensible randomization (-5% to +8% jitter)
-            jitter = random.uniform(-0.05, 0.08)
-            final_income = expected_income * (1 + jitter)
-            
-            # Ensure sensible minimum based on hours worked
-            min_income = max(3000, profile.total_hours_worked_month * 40)
-            
-            results.append(round(max(min_income, final_income), 2))
-            
-        return {
-            "success": True, 
-            "predictions": results,
-            "total_estimated_income": round(sum(results), 2)
-        }
+        rng = random.Random(data.seed) if data.seed is not None else None
+        if engine == "model" and income_model is not None:
+            cols = model_columns_from_profiles(data.profiles, income_model)
+        else:
+            cols = columns_from_profiles(data.profiles)
+        results, engines = _predict_income_rows("predict_income", cols, rng, engine)
+
+        return _income_response(results, engines)
     except Exception as e:
         import traceback
         print("[ERROR] Heuristic Prediction error traceback:")
@@ -317,6 +697,105 @@ def predict_income(data: IncomeBatchRequest):
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 
+# Column dtypes/defaults for bulk ingestion, taken from the row model
+INCOME_SCHEMA = column_schema(GigWorkerIncomeData)
+# Never read as one-hot columns, even when the name starts with a categorical
+# field (platform_hours_ratio vs. platform)
+INCOME_NUMERIC_FIELDS = frozenset(name for name, (annotation, _) in INCOME_SCHEMA.items() if annotation in (int, float))
+INCOME_DEFAULTS = {name: default for name, (_, default) in INCOME_SCHEMA.items()}
+
+@app.post("/predict_income/bulk")
+async def predict_income_bulk(request: Request, seed: Optional[int] = None, engine: Optional[str] = None):
+    """
+    Column-oriented bulk income prediction (CSV, JSON-of-arrays or Arrow IPC).
+    Columns are validated as whole arrays and scored without per-row models.
+    """
+    try:
+        engine = resolve_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    def _score():
+        if content_type == "text/csv":
+            raw, body_seed = parse_csv(body, INCOME_SCHEMA), None
+        elif content_type in ARROW_CONTENT_TYPES:
+            raw, body_seed = parse_arrow(body), None
+        else:
+            raw, body_seed = parse_json_columns(body)
+        cols = validate_columns(raw, INCOME_SCHEMA)
+        run_seed = seed if seed is not None else body_seed
+        rng = random.Random(run_seed) if run_seed is not None else None
+        return _predict_income_rows("predict_income_bulk", cols, rng, engine)
+
+    try:
+        results, engines = await run_in_threadpool(_score)
+    except ImportError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except (ColumnError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid input: {e}")
+
+    return _income_response(results, engines)
+
+
+INCOME_STREAM_CHUNK_ROWS = int(os.getenv("INCOME_STREAM_CHUNK_ROWS", "5000"))
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator may keep reading the request body.
+    Starlette's default races a disconnect listener against the iterator on
+    ASGI < 2.4 servers (uvicorn), and that listener would swallow body chunks.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/predict_income/stream")
+async def predict_income_stream(request: Request, seed: Optional[int] = None, engine: Optional[str] = None):
+    """
+    Streaming income prediction for very large batches (CSV or NDJSON body).
+
+    The body is read and scored chunk by chunk; the response is NDJSON with one
+    {"offset", "predictions"} record per chunk, then a trailer record carrying
+    the row count and total_estimated_income. Memory stays bounded by
+    INCOME_STREAM_CHUNK_ROWS whatever the batch size.
+    """
+    try:
+        engine = resolve_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    rng = random.Random(seed) if seed is not None else random.Random()
+
+    def _score(raw: dict) -> tuple[list, Optional[list]]:
+        return _predict_income_rows("predict_income_stream", validate_columns(raw, INCOME_SCHEMA), rng, engine)
+
+    async def _records():
+        rows, total = 0, 0
+        try:
+            async for offset, raw in iter_column_chunks(
+                request.stream(), content_type, INCOME_STREAM_CHUNK_ROWS, INCOME_DEFAULTS,
+            ):
+                predictions, engines = await run_in_threadpool(_score, raw)
+                rows += len(predictions)
+                total = sum(predictions, total)
+                record = {"offset": offset, "predictions": predictions}
+                if engines is not None:
+                    record["engines"] = engines
+                yield dumps(record) + b"\n"
+        except (ColumnError, ValueError) as e:
+            yield dumps({"success": False, "error": f"Invalid input after {rows} rows: {e}"}) + b"\n"
+            return
+        yield dumps({"success": True, "rows": rows, "total_estimated_income": round(total, 2)}) + b"\n"
+
+    return DuplexStreamingResponse(_records(), media_type="application/x-ndjson")
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=False)
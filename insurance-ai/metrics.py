@@ -0,0 +1,183 @@
+"""
+Metrics
+Stage timings, counters and a Prometheus text-format /metrics body, without
+a client library.
+
+`span(stage)` times a block into the `stage_seconds` histogram and into the
+timing dict of the request being served; TimingMiddleware sends that dict
+back as a Server-Timing header (stages that run concurrently, such as
+quota_wait, add up). Recording is a perf_counter() pair, a bisect and a few
+dict updates, so spans are cheap enough for the hot path. Counters that
+other modules already keep (LLM cache, recommendation store, quota, tokens)
+are read only when /metrics is scraped.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+PREFIX = "insurance_ai_"
+
+# Seconds: spans from sub-millisecond cache lookups up to LLM timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+# Stage timings of the request currently being served (set by TimingMiddleware)
+_request_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = PREFIX + name, help, labelnames
+        self.values: dict = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in sorted(self.values.items())]
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, labels: tuple, value: float):
+        self.values[labels] = value
+
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = PREFIX + name, help, labelnames
+        self.buckets = buckets
+        self.series: dict = {}      # labels → [per-bucket counts (+Inf last), sum]
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                names, values = (*self.labelnames, "le"), (*labels, bound)
+                lines.append(f"{self.name}_bucket{_labels(names, values)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram("stage_seconds", "Time spent per pipeline stage", ("stage",))
+http_request_seconds = Histogram("http_request_seconds", "Request latency up to the response headers", ("route",))
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", ("route", "status"))
+llm_calls = Counter("llm_calls_total", "LLM calls by pipeline stage and outcome", ("stage", "outcome"))
+llm_call_seconds = Histogram("llm_call_seconds", "LLM call latency (after the quota wait)", ("stage",))
+fallbacks = Counter("fallbacks_total", "Results served from the rule-based / template path", ("reason",))
+income_rows = Counter("income_rows_total", "Rows scored by the income endpoints", ("endpoint",))
+income_seconds = Counter("income_scoring_seconds_total", "Time spent scoring income rows", ("endpoint",))
+income_rows_per_second = Gauge("income_rows_per_second", "Throughput of the most recent income batch", ("endpoint",))
+
+_metrics = [
+    stage_seconds, http_request_seconds, http_requests, llm_calls, llm_call_seconds,
+    fallbacks, income_rows, income_seconds, income_rows_per_second,
+]
+_collectors: list = []
+
+
+def record(stage: str, seconds: float):
+    stage_seconds.observe((stage,), seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def record_income_rows(endpoint: str, rows: int, seconds: float):
+    income_rows.inc((endpoint,), rows)
+    income_seconds.inc((endpoint,), seconds)
+    if seconds > 0:
+        income_rows_per_second.set((endpoint,), round(rows / seconds, 1))
+
+
+def collector(fn: Callable[[], list]):
+    """Register fn() → [(name, type, help, {label tuple: value}, labelnames)] read at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    for fn in _collectors:
+        for name, kind, help, values, labelnames in fn():
+            lines += [f"# HELP {PREFIX}{name} {help}", f"# TYPE {PREFIX}{name} {kind}"]
+            lines += [f"{PREFIX}{name}{_labels(labelnames, k)} {v}" for k, v in values.items()]
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware: collects the request's spans, adds them as a
+    Server-Timing header (plus `app`, the time to the response headers) and
+    records per-route latency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: dict = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")
+                http_request_seconds.observe((getattr(route, "path", "unmatched"),), elapsed)
+                timings["app"] = elapsed
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", server_timing(timings).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            http_requests.inc((getattr(route, "path", "unmatched"), status))
@@ -0,0 +1,142 @@
+"""
+Precompute
+Offline job that scores an exported user base into the recommendation store.
+
+    python precompute.py workers.ndjson --db recommendations.sqlite3
+
+Input is NDJSON / JSON list / CSV of WorkerProfile records. Records are
+processed in chunks through the cohort pipeline (get_recommendations_batch),
+so they share the LLM cache, single-flight and rate limiter exactly like live
+traffic; point LLM_CACHE_DB at the service's cache file to share answers
+with it too. LLM calls run at "background" priority (see quota_scheduler);
+with QUOTA_DB pointing at the service's file both count against one daily
+quota, and the job stops at a chunk boundary once the remaining quota is
+reserved for live traffic, or as soon as a chunk comes back with results
+that fell back to the rule-based path (those are not stored, and the
+checkpoint stays at that chunk). After every chunk the rows and the job checkpoint
+are committed together: re-running the same command resumes after the last
+finished chunk, and workers whose stored profile hash and catalog version are
+still current are skipped. Serve the result by starting the API with
+RECOMMENDATION_STORE_DB pointing at the same file.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+
+from pydantic import ValidationError
+
+from ai_recommender import close_client, get_recommendations_batch
+from catalog_store import catalog_store
+from main import WorkerProfile
+from quota_scheduler import llm_priority, llm_scheduler
+from recommendation_store import RecommendationStore, profile_hash
+
+
+def read_profiles(path: str) -> list[dict]:
+    with open(path, encoding="utf-8-sig") as f:
+        if path.endswith(".csv"):
+            return [{k: v for k, v in row.items() if v != ""} for row in csv.DictReader(f)]
+        if path.endswith(".json"):
+            return json.load(f)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def precompute(
+    path: str,
+    db: str,
+    job: str,
+    chunk_size: int = 200,
+    restart: bool = False,
+    refresh: bool = False,
+    explain_mode: str = "batch",
+):
+    llm_priority.set("background")
+    store = RecommendationStore(db)
+    records = read_profiles(path)
+    if restart:
+        store.reset_checkpoint(job)
+    start = store.checkpoint(job)
+    catalog = catalog_store.snapshot
+    print(f"{len(records)} records, resuming at {start}, catalog {catalog.version}")
+
+    done = skipped = invalid = 0
+    t0 = time.monotonic()
+    try:
+        for offset in range(start, len(records), chunk_size):
+            if not llm_scheduler.admits():
+                print(f"stopping at {offset}: remaining daily quota is reserved for higher-priority traffic")
+                break
+            profiles = []
+            for i, record in enumerate(records[offset:offset + chunk_size], start=offset):
+                try:
+                    profile = WorkerProfile(**record)
+                except (TypeError, ValidationError) as e:
+                    invalid += 1
+                    print(f"record {i}: skipped ({e.__class__.__name__})")
+                    continue
+                profile_dict = profile.model_dump()
+                phash = profile_hash(profile_dict)
+                if not refresh and store.current(profile.user_id) == (phash, catalog.version):
+                    skipped += 1
+                    continue
+                profiles.append((profile, profile_dict, phash))
+
+            rows, degraded = [], []
+            if profiles:
+                plan_sets = [catalog.index.eligible(p.employment_type) for p, _, _ in profiles]
+                results, stats = await get_recommendations_batch(
+                    [d for _, d, _ in profiles],
+                    plan_sets,
+                    [p.top_n or 3 for p, _, _ in profiles],
+                    explain_mode=explain_mode,
+                    deadline_ms=0,      # offline: no deadline, the rate limiter paces the run
+                    catalog=catalog,
+                )
+                # Fallback results are not stored: a later run retries them
+                degraded = set(stats["degraded"])
+                rows = [
+                    (p.user_id, phash, catalog.version, recs)
+                    for n, ((p, _, phash), recs) in enumerate(zip(profiles, results))
+                    if n not in degraded
+                ]
+            if degraded:
+                # Keep the checkpoint at this chunk so resuming re-runs it
+                store.put_many(rows, job=job, next_offset=offset)
+                done += len(rows)
+                print(f"stopping at {offset}: {len(degraded)} results fell back to the rule-based path (LLM unavailable or quota spent)")
+                break
+            next_offset = min(offset + chunk_size, len(records))
+            store.put_many(rows, job=job, next_offset=next_offset)
+            done += len(rows)
+            rate = done / max(time.monotonic() - t0, 1e-9)
+            print(f"{next_offset}/{len(records)} checkpointed ({done} scored, {skipped} current, {invalid} invalid, {rate:.1f}/s)")
+    finally:
+        await close_client()
+    return {"scored": done, "skipped": skipped, "invalid": invalid}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute recommendations for a user base")
+    parser.add_argument("input", help="NDJSON, JSON list or CSV of WorkerProfile records")
+    parser.add_argument("--db", default=os.getenv("RECOMMENDATION_STORE_DB") or "recommendations.sqlite3")
+    parser.add_argument("--job", help="checkpoint name (default: input file name)")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--explain-mode", default="batch", choices=("batch", "individual"))
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the top")
+    parser.add_argument("--refresh", action="store_true", help="recompute workers whose stored result is current")
+    args = parser.parse_args()
+
+    summary = asyncio.run(precompute(
+        args.input,
+        args.db,
+        args.job or os.path.basename(args.input),
+        chunk_size=args.chunk_size,
+        restart=args.restart,
+        refresh=args.refresh,
+        explain_mode=args.explain_mode,
+    ))
+    print(json.dumps(summary))
@@ -0,0 +1,84 @@
+"""
+Prompt Fragments
+Per-plan text blocks used in the LLM prompts, rendered once per catalog
+snapshot instead of once per request.
+
+Stage 1 has two encodings: `rank_line` (one labelled line per plan, with the
+free-text best_for) and the compact `rank_row` (pipe-separated columns under
+RANK_TABLE_HEADER), which is under a third of the tokens.
+"""
+
+from typing import Optional
+
+from token_meter import estimate_tokens
+
+RANK_TABLE_HEADER = "plan_id|category|targets|premium_per_day_inr|coverage_inr"
+
+
+def rank_line(plan: dict) -> str:
+    """One line per plan in the stage-1 ranking prompt."""
+    return (
+        f"- plan_id: {plan['plan_id']} | name: {plan['plan_name']} | "
+        f"category: {plan['category']} | targets: {plan['target_workers']} | "
+        f"per_day: ₹{plan['premium']['per_day']} | coverage: ₹{plan['coverage_amount']:,} | "
+        f"best_for: {plan.get('best_for','')}"
+    )
+
+
+def rank_row(plan: dict) -> str:
+    """One row per plan in the compact stage-1 table."""
+    return (
+        f"{plan['plan_id']}|{plan['category']}|{','.join(plan['target_workers'])}|"
+        f"{plan['premium']['per_day']:g}|{plan['coverage_amount']}"
+    )
+
+
+def plan_details(plan: dict) -> str:
+    """Plan block in the stage-2 explanation prompts."""
+    return (
+        f"- Name: {plan['plan_name']} by {plan['provider']}\n"
+        f"- Daily Premium: ₹{plan['premium']['per_day']}\n"
+        f"- Coverage: ₹{plan['coverage_amount']:,}\n"
+        f"- What it covers: {', '.join(plan['inclusions'][:4])}\n"
+        f"- What it does NOT cover: {', '.join(plan['exclusions'][:3])}\n"
+        f"- How to claim: {plan['claim_process']}\n"
+        f"- Best for: {plan.get('best_for', '')}"
+    )
+
+
+class PromptFragments:
+    def __init__(self, plans: list, versions: dict, previous: Optional["PromptFragments"] = None):
+        """`versions` maps plan_id → content hash; unchanged plans reuse `previous` text."""
+        self.versions = versions
+        self.rank_lines, self.rank_rows, self.details = {}, {}, {}
+        for p in plans:
+            pid = p["plan_id"]
+            if previous is not None and previous.versions.get(pid) == versions[pid]:
+                self.rank_lines[pid] = previous.rank_lines[pid]
+                self.rank_rows[pid] = previous.rank_rows[pid]
+                self.details[pid] = previous.details[pid]
+            else:
+                self.rank_lines[pid] = rank_line(p)
+                self.rank_rows[pid] = rank_row(p)
+                self.details[pid] = plan_details(p)
+
+    def rank(self, plan: dict) -> str:
+        line = self.rank_lines.get(plan["plan_id"])
+        return line if line is not None else rank_line(plan)
+
+    def row(self, plan: dict) -> str:
+        row = self.rank_rows.get(plan["plan_id"])
+        return row if row is not None else rank_row(plan)
+
+    def rank_block(self, plans: list, fmt: str = "table") -> str:
+        """The plan list of a stage-1 prompt in the given encoding ("table" or "lines")."""
+        if fmt == "table":
+            return "\n".join([RANK_TABLE_HEADER, *(self.row(p) for p in plans)])
+        return "\n".join(self.rank(p) for p in plans)
+
+    def rank_tokens(self, plan: dict, fmt: str = "table") -> int:
+        return estimate_tokens(self.row(plan) if fmt == "table" else self.rank(plan)) + 1
+
+    def detail(self, plan: dict) -> str:
+        text = self.details.get(plan["plan_id"])
+        return text if text is not None else plan_details(plan)
@@ -0,0 +1,293 @@
+"""
+Quota Scheduler
+Orders LLM calls by priority class and keeps them inside the provider quota.
+
+Every call in _call_groq waits here for a slot. A slot needs a token from the
+process's bucket (rate_limiter.llm_limiter), room in the per-minute window and
+daily quota left. Waiting calls sit in one queue per priority class
+(interactive /recommend traffic, batch cohorts, background jobs such as
+precompute), and queues are served by weight (stride scheduling), so a large
+batch backlog only takes its share of the slots and interactive calls go
+out almost as soon as a token is free.
+
+Calls per UTC day and per minute are counted in SQLite (QUOTA_DB), which
+survives restarts. Processes pointing at the same file (API workers and the
+precompute job) share the day count and the current minute's count: the
+scheduler re-reads the minute count at most every MINUTE_REFRESH seconds and
+holds grants until the next minute once the shared total reaches the limit.
+The grant times in the sliding window and the token bucket stay per process.
+A grant bumps the in-memory count at once; the SQLite write runs in a worker
+thread so it never blocks the event loop.
+When the day's remaining quota falls below a class's reserve, calls of that
+class fail fast with QuotaExhausted and the pipeline serves them from the
+rule-based path, keeping the rest of the budget for higher-priority traffic.
+
+The priority of the current request travels in the `llm_priority` ContextVar.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from rate_limiter import GROQ_REQUESTS_PER_DAY, GROQ_REQUESTS_PER_MINUTE, TokenBucket, llm_limiter
+
+QUOTA_DB = os.getenv("QUOTA_DB", "")     # e.g. quota.sqlite3 (unset = in memory, lost on restart)
+MINUTE_REFRESH = float(os.getenv("QUOTA_MINUTE_REFRESH", "1"))   # seconds between reads of the shared minute count
+
+
+def _parse_classes(spec: str) -> dict:
+    return {name.strip(): float(value) for name, value in (item.split("=") for item in spec.split(",") if item.strip())}
+
+
+# Priority classes, highest first: queue weight and the share of the daily
+# quota that must remain for the class to still be sent to the LLM
+PRIORITY_WEIGHTS = _parse_classes(os.getenv("QUOTA_WEIGHTS", "interactive=8,batch=2,background=1"))
+PRIORITY_RESERVES = _parse_classes(os.getenv("QUOTA_RESERVES", "interactive=0,batch=0.2,background=0.4"))
+DEFAULT_PRIORITY = "interactive"
+
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default=DEFAULT_PRIORITY)
+
+
+class QuotaExhausted(Exception):
+    """Raised when the remaining quota is reserved for higher-priority work."""
+
+
+class QuotaUsage:
+    """Call counts per UTC day and per minute, optionally persisted in SQLite."""
+
+    def __init__(self, db_path: str = ""):
+        self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS quota_usage (bucket TEXT PRIMARY KEY, calls INTEGER NOT NULL)")
+        self._db.commit()
+        self._day, self.today = None, 0
+        self._minute_calls, self._minute_read_at = 0, float("-inf")
+        self.refresh()
+
+    @staticmethod
+    def _buckets(now: float) -> tuple[str, str]:
+        day = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+        return f"day:{day}", f"minute:{int(now // 60)}"
+
+    def _count(self, bucket: str) -> int:
+        row = self._db.execute("SELECT calls FROM quota_usage WHERE bucket = ?", (bucket,)).fetchone()
+        return row[0] if row else 0
+
+    def refresh(self):
+        """Re-read today's count (picks up other processes and day rollover)."""
+        day, _ = self._buckets(time.time())
+        with self._db_lock:
+            self.today = self._count(day)
+        self._day = day
+
+    def roll(self):
+        """Start a new count when the UTC day has changed."""
+        if self._buckets(time.time())[0] != self._day:
+            self.refresh()
+
+    def minute(self) -> int:
+        _, minute = self._buckets(time.time())
+        with self._db_lock:
+            return self._count(minute)
+
+    def shared_minute(self, max_age: float = MINUTE_REFRESH) -> int:
+        """This minute's calls across every process using the file, re-read at most every max_age seconds."""
+        now = time.monotonic()
+        if now - self._minute_read_at >= max_age:
+            self._minute_calls, self._minute_read_at = self.minute(), now
+        return self._minute_calls
+
+    def add(self):
+        """Count a call in memory right away; record() persists it."""
+        self.roll()
+        self.today += 1
+
+    def record(self):
+        """Persist one call (blocking SQLite work: the scheduler runs it in a worker thread)."""
+        now = time.time()
+        day, minute = self._buckets(now)
+        with self._db_lock, self._db:
+            for bucket in (day, minute):
+                self._db.execute(
+                    "INSERT INTO quota_usage (bucket, calls) VALUES (?, 1) "
+                    "ON CONFLICT(bucket) DO UPDATE SET calls = calls + 1",
+                    (bucket,),
+                )
+            # Minute buckets are only needed for the current window
+            self._db.execute(
+                "DELETE FROM quota_usage WHERE bucket LIKE 'minute:%' AND bucket < ?", (f"minute:{int(now // 60) - 1}",),
+            )
+            count = self._count(day)
+        if day == self._day:
+            # Writes land out of order; other processes only ever add calls
+            self.today = max(self.today, count)
+        else:
+            self.today, self._day = count, day
+
+
+class QuotaScheduler:
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        usage: QuotaUsage,
+        daily_quota: int = GROQ_REQUESTS_PER_DAY,
+        per_minute: int = GROQ_REQUESTS_PER_MINUTE,
+        weights: Optional[dict] = None,
+        reserves: Optional[dict] = None,
+    ):
+        self.bucket = bucket
+        self.usage = usage
+        self.daily_quota = daily_quota
+        self.per_minute = per_minute
+        self.weights = weights or PRIORITY_WEIGHTS
+        self.reserves = reserves or PRIORITY_RESERVES
+        self._queues = {name: deque() for name in self.weights}
+        self._pass = {name: 0.0 for name in self.weights}
+        self._vtime = 0.0                   # pass value of the last grant
+        self._window: deque = deque()       # grant times within the last minute
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._writes: set = set()           # pending usage.record() calls
+        self.write_errors = 0
+        self.counters = {name: {"granted": 0, "rejected": 0, "waited_seconds": 0.0} for name in self.weights}
+        # Seed the window with calls made this minute before a restart
+        self._window.extend([time.monotonic()] * usage.minute())
+
+    @property
+    def remaining(self) -> int:
+        return max(self.daily_quota - self.usage.today, 0)
+
+    def _priority(self, priority: Optional[str]) -> str:
+        priority = priority or llm_priority.get()
+        return priority if priority in self.weights else DEFAULT_PRIORITY
+
+    def admits(self, priority: Optional[str] = None) -> bool:
+        """Whether the remaining daily quota is enough for this priority class."""
+        priority = self._priority(priority)
+        if self.remaining <= 0:
+            return False
+        return self.remaining > self.daily_quota * self.reserves.get(priority, 0.0)
+
+    def _delay(self) -> float:
+        """Seconds until a slot could be granted."""
+        now = time.monotonic()
+        while self._window and now - self._window[0] >= 60:
+            self._window.popleft()
+        minute_wait = 60 - (now - self._window[0]) if len(self._window) >= self.per_minute else 0.0
+        if self.usage.shared_minute() >= self.per_minute:
+            # Other processes used up the minute: wait for the next minute bucket
+            minute_wait = max(minute_wait, 60 - time.time() % 60)
+        return max(self.bucket.delay(), minute_wait)
+
+    def _grant(self, priority: str, waited: float):
+        self.bucket.try_acquire()
+        self._window.append(time.monotonic())
+        self.usage.add()
+        write = asyncio.create_task(asyncio.to_thread(self.usage.record))
+        self._writes.add(write)
+        write.add_done_callback(self._written)
+        counters = self.counters[priority]
+        counters["granted"] += 1
+        counters["waited_seconds"] += waited
+
+    def _written(self, write: asyncio.Task):
+        self._writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            self.write_errors += 1
+            print(f"Warning: could not persist quota usage: {write.exception()}")
+
+    async def acquire(self, priority: Optional[str] = None):
+        """Wait for a call slot in this priority's queue; QuotaExhausted if its budget is spent."""
+        priority = self._priority(priority)
+        self.usage.roll()
+        if not self.admits(priority):
+            self.counters[priority]["rejected"] += 1
+            raise QuotaExhausted(f"{self.remaining} calls left today are reserved above '{priority}' priority")
+
+        if not any(self._queues.values()) and self._delay() == 0:
+            self._grant(priority, 0.0)
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queues[priority].append((future, time.monotonic()))
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        # Cancelling the wait (deadline, disconnect) cancels the future and
+        # the dispatcher skips it
+        await future
+
+    def _next(self) -> Optional[str]:
+        """Non-empty queue with the lowest stride pass; a class that was idle does not bank credit."""
+        ready = [name for name, q in self._queues.items() if q]
+        if not ready:
+            return None
+        return min(ready, key=lambda name: (max(self._pass[name], self._vtime), -self.weights[name]))
+
+    async def _dispatch(self):
+        while True:
+            # Drop waiters that gave up (deadline or disconnect)
+            for q in self._queues.values():
+                while q and q[0][0].done():
+                    q.popleft()
+            name = self._next()
+            if name is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            future, queued_at = self._queues[name].popleft()
+            if future.done():
+                continue
+            self._vtime = max(self._pass[name], self._vtime)
+            self._pass[name] = self._vtime + 1 / self.weights[name]
+            if not self.admits(name):
+                self.counters[name]["rejected"] += 1
+                future.set_exception(QuotaExhausted(f"daily quota reserved above '{name}' priority"))
+                continue
+            try:
+                self._grant(name, time.monotonic() - queued_at)
+            except Exception as e:
+                # The waiter gets the error; the dispatcher keeps serving the queues
+                future.set_exception(e)
+                continue
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "daily_quota": self.daily_quota,
+            "used_today": self.usage.today,
+            "remaining_today": self.remaining,
+            "per_minute": self.per_minute,
+            "used_last_minute": len(self._window),
+            "shared_last_minute": self.usage.shared_minute(),
+            "write_errors": self.write_errors,
+            "classes": {
+                name: {
+                    "weight": self.weights[name],
+                    "reserve": self.reserves.get(name, 0.0),
+                    "admitted": self.admits(name),
+                    "queued": len(self._queues[name]),
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.counters[name].items()},
+                }
+                for name in self.weights
+            },
+        }
+
+
+# Shared by every LLM call made by this process
+llm_scheduler = QuotaScheduler(llm_limiter, QuotaUsage(QUOTA_DB))
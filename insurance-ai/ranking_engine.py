@@ -0,0 +1,100 @@
+"""
+Ranking Engine
+Vectorized rule-based plan scoring over a columnar (NumPy) catalog.
+
+The catalog is compiled once into arrays — per-day premium, coverage,
+category codes and a target-worker bitmask — so scoring is a handful of
+array operations instead of a Python loop over plan dicts. Many profiles can
+be scored against all plans in one call (profiles × plans matrix), and top-N
+selection uses a partial selection instead of a full sort.
+
+Scores are identical to the original per-plan rules:
+  base 50, +20 if the worker type is targeted, +15 / +8 for cheap premiums
+  relative to daily income, +10 for HIGH risk & coverage ≥ ₹3L or LOW risk
+  & premium ≤ ₹20/day, capped at 99.
+"""
+
+import numpy as np
+
+
+class CompiledCatalog:
+    """Columnar view of a list of plans (order preserved)."""
+
+    def __init__(self, plans: list):
+        self.plans = list(plans)
+        self.plan_ids = [p["plan_id"] for p in self.plans]
+        self.position = {pid: i for i, pid in enumerate(self.plan_ids)}
+
+        self.per_day = np.array([p["premium"]["per_day"] for p in self.plans], dtype=np.float64)
+        self.coverage = np.array([p["coverage_amount"] for p in self.plans], dtype=np.float64)
+
+        self.categories = sorted({p["category"] for p in self.plans})
+        category_code = {c: i for i, c in enumerate(self.categories)}
+        self.category_codes = np.array(
+            [category_code[p["category"]] for p in self.plans], dtype=np.int16
+        )
+
+        worker_types = sorted({w for p in self.plans for w in p.get("target_workers", [])})
+        self.worker_bit = {w: 1 << i for i, w in enumerate(worker_types)}
+        self.target_mask = np.array(
+            [sum(self.worker_bit[w] for w in set(p.get("target_workers", []))) for p in self.plans],
+            dtype=np.int64,
+        )
+
+    def __len__(self):
+        return len(self.plans)
+
+    def positions(self, plans: list):
+        """Array positions of `plans` in this catalog, or None if any is unknown."""
+        try:
+            return np.fromiter((self.position[p["plan_id"]] for p in plans), dtype=np.intp, count=len(plans))
+        except KeyError:
+            return None
+
+
+def score_profiles(compiled: CompiledCatalog, profiles: list, positions=None) -> np.ndarray:
+    """
+    Rule-based match scores for many profiles at once.
+    Returns an int array of shape (len(profiles), n_plans); `positions`
+    restricts (and orders) the plan columns.
+    """
+    per_day, coverage, target_mask = compiled.per_day, compiled.coverage, compiled.target_mask
+    if positions is not None:
+        per_day, coverage, target_mask = per_day[positions], coverage[positions], target_mask[positions]
+
+    emp_bits = np.array(
+        [compiled.worker_bit.get(p.get("employment_type", "delivery"), 0) for p in profiles], dtype=np.int64
+    )[:, None]
+    daily_income = (
+        np.array([p.get("avg_monthly_income", 15000) for p in profiles], dtype=np.float64) / 30
+    )[:, None]
+    risk = np.array([p.get("risk_classification", "MEDIUM") for p in profiles], dtype=object)[:, None]
+
+    score = np.full((len(profiles), len(per_day)), 50, dtype=np.int64)
+    score += np.where((target_mask & emp_bits) != 0, 20, 0)
+
+    ratio = per_day / daily_income
+    score += np.where(ratio < 0.002, 15, np.where(ratio < 0.004, 8, 0))
+
+    score += np.where((risk == "HIGH") & (coverage >= 300000), 10, 0)
+    score += np.where((risk == "LOW") & (per_day <= 20), 10, 0)
+
+    return np.minimum(score, 99)
+
+
+def top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Indices of the n highest scores, highest first. Ties keep input order,
+    matching a stable `sorted(..., reverse=True)`.
+    """
+    size = len(scores)
+    n = min(n, size)
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    # Unique composite key: higher score first, then lower index first
+    key = -scores.astype(np.int64) * size + np.arange(size, dtype=np.int64)
+    if n < size:
+        part = np.argpartition(key, n - 1)[:n]
+    else:
+        part = np.arange(size)
+    return part[np.argsort(key[part], kind="stable")]
@@ -0,0 +1,61 @@
+"""
+Rate Limiter
+Process-wide token bucket shared by every LLM call in this worker.
+
+The bucket refills continuously at the provider's sustained rate (daily quota
+spread over 24h) and holds up to `capacity` tokens, so short bursts go out
+immediately while the long-run call rate never exceeds the quota. Callers do
+not wait on the bucket: quota_scheduler queues them, asks delay() when the
+next token is due and takes it with try_acquire().
+"""
+
+import os
+import time
+
+# Groq free tier: 14,400 requests/day, 30 requests/minute
+GROQ_REQUESTS_PER_DAY = int(os.getenv("GROQ_REQUESTS_PER_DAY", "14400"))
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_BURST = int(os.getenv("GROQ_BURST", "30"))
+
+
+class TokenBucket:
+    """Token bucket without a wait queue; the quota scheduler orders the waiters."""
+
+    def __init__(self, rate_per_sec: float, capacity: int):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self.acquired = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Take tokens without waiting. Returns False if the bucket is short."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            self.acquired += 1
+            return True
+        return False
+
+    def delay(self, tokens: int = 1) -> float:
+        """Seconds until `tokens` would be available."""
+        self._refill()
+        return max(tokens - self._tokens, 0.0) / self.rate
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "rate_per_sec": round(self.rate, 4),
+            "capacity": self.capacity,
+            "available": round(self._tokens, 2),
+            "acquired": self.acquired,
+        }
+
+
+# Shared by every request handled by this process
+llm_limiter = TokenBucket(GROQ_REQUESTS_PER_DAY / 86400, GROQ_BURST)
@@ -0,0 +1,121 @@
+"""
+Recommendation Store
+Precomputed /recommend results, written by precompute.py.
+
+One SQLite row per worker: user_id → (profile hash, catalog version,
+zlib-compressed JSON recommendations). /recommend serves a row only when the
+worker's current profile hashes to the stored value and the row was computed
+against the active catalog version, so an edited profile or a catalog change
+falls through to the live pipeline.
+
+Job checkpoints live in the same file and are written in the same
+transaction as the rows they cover, so an interrupted run resumes exactly
+where it stopped.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+
+RECOMMENDATION_STORE_DB = os.getenv("RECOMMENDATION_STORE_DB", "")   # e.g. recommendations.sqlite3
+
+# WorkerProfile fields that do not change the recommendations
+_HASH_EXCLUDED = ("user_id", "explain_mode", "deadline_ms")
+
+
+def profile_hash(profile: dict) -> str:
+    """Exact (unbucketed) hash of every profile field that shapes the result."""
+    canonical = {k: v for k, v in profile.items() if k not in _HASH_EXCLUDED}
+    blob = json.dumps(canonical, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()[:20]
+
+
+class RecommendationStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0}
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS recommendations ("
+            "user_id TEXT PRIMARY KEY, profile_hash TEXT NOT NULL, catalog_version TEXT NOT NULL, "
+            "payload BLOB NOT NULL, computed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "job TEXT PRIMARY KEY, next_offset INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, user_id: str, phash: str, catalog_version: str) -> Optional[list]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT profile_hash, catalog_version, payload FROM recommendations WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        if row is None:
+            self.counters["misses"] += 1
+            return None
+        if row[0] != phash or row[1] != catalog_version:
+            self.counters["stale"] += 1
+            return None
+        self.counters["hits"] += 1
+        return json.loads(zlib.decompress(row[2]))
+
+    def current(self, user_id: str) -> Optional[tuple]:
+        """(profile_hash, catalog_version) stored for a worker, if any."""
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT profile_hash, catalog_version FROM recommendations WHERE user_id = ?", (user_id,),
+            ).fetchone()
+
+    def put_many(self, rows: list, job: Optional[str] = None, next_offset: Optional[int] = None):
+        """
+        Store (user_id, profile_hash, catalog_version, recommendations) rows and,
+        atomically with them, advance the job checkpoint.
+        """
+        now = time.time()
+        encoded = [
+            (user_id, phash, version, zlib.compress(json.dumps(recs, ensure_ascii=False).encode()), now)
+            for user_id, phash, version, recs in rows
+        ]
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO recommendations "
+                "(user_id, profile_hash, catalog_version, payload, computed_at) VALUES (?, ?, ?, ?, ?)",
+                encoded,
+            )
+            if job is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO checkpoints (job, next_offset, updated_at) VALUES (?, ?, ?)",
+                    (job, next_offset, now),
+                )
+
+    def checkpoint(self, job: str) -> int:
+        with self._db_lock:
+            row = self._db.execute("SELECT next_offset FROM checkpoints WHERE job = ?", (job,)).fetchone()
+        return row[0] if row else 0
+
+    def reset_checkpoint(self, job: str):
+        with self._db_lock, self._db:
+            self._db.execute("DELETE FROM checkpoints WHERE job = ?", (job,))
+
+    def stats(self) -> dict:
+        with self._db_lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM recommendations").fetchone()[0]
+        lookups = sum(self.counters.values())
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "rows": rows,
+            "db_path": self.db_path,
+        }
+
+
+recommendation_store = RecommendationStore(RECOMMENDATION_STORE_DB) if RECOMMENDATION_STORE_DB else None
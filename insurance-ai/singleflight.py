@@ -0,0 +1,59 @@
+"""
+Single-flight
+Collapses concurrent identical LLM work into one in-flight call.
+
+The first caller for a key starts the work as a task; callers that arrive
+while it is running await the same task instead of issuing their own call.
+Every caller gets the same result or the same exception. A caller that is
+cancelled only stops waiting — the shared work is cancelled only when no
+caller is left waiting for it.
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(fn())
+            entry = {"task": task, "waiters": 0}
+            self._inflight[key] = entry
+            task.add_done_callback(lambda _t, e=entry: self._forget(key, e))
+            self.leaders += 1
+        else:
+            self.collapsed += 1
+
+        task = entry["task"]
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # This caller was cancelled; drop the shared work only if nobody else wants it
+            if not task.done() and entry["waiters"] == 1:
+                self._forget(key, entry)
+                task.cancel()
+            raise
+        finally:
+            entry["waiters"] -= 1
+
+    def _forget(self, key: str, entry: dict):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._inflight),
+        }
+
+
+# Shared by every request handled by this process
+llm_inflight = SingleFlight()
@@ -0,0 +1,87 @@
+"""
+Startup
+Cold-start bookkeeping: import timings and readiness phases.
+
+main.py marks the end of each import group, so the startup report shows
+where import time goes. Heavy initialisation (Groq client, income model,
+process pool) runs as named phases. With STARTUP_MODE=background (default)
+the phases run in a warm-up task after the server is listening, so /health
+answers immediately; with STARTUP_MODE=eager they finish before the first
+request is accepted.
+
+    python startup.py      # print the startup timing report for main.py
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Optional
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")   # background | eager
+
+PENDING, RUNNING, READY, FAILED = "pending", "running", "ready", "failed"
+
+
+class Startup:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.imports = {}      # import group -> seconds
+        self.phases = {}       # phase -> {"state", "seconds", "error"}
+        self.listening_at: Optional[float] = None
+
+    def mark(self, name: str):
+        """Record the time spent since the previous mark under `name`."""
+        now = time.perf_counter()
+        self.imports[name] = round(now - self._last, 4)
+        self._last = now
+
+    def add_phase(self, name: str):
+        self.phases.setdefault(name, {"state": PENDING, "seconds": None, "error": None})
+
+    async def run_phase(self, name: str, fn: Callable, *, blocking: bool = True):
+        """Run one warm-up phase; blocking callables go to a thread."""
+        self.add_phase(name)
+        phase = self.phases[name]
+        phase["state"] = RUNNING
+        t0 = time.perf_counter()
+        try:
+            if blocking:
+                await asyncio.to_thread(fn)
+            else:
+                await fn()
+        except Exception as e:
+            phase.update(state=FAILED, error=str(e))
+            print(f"Warning: startup phase '{name}' failed: {e}")
+        else:
+            phase["state"] = READY
+        phase["seconds"] = round(time.perf_counter() - t0, 4)
+
+    @property
+    def ready(self) -> bool:
+        # A failed phase leaves the service degraded, not unready
+        return all(p["state"] in (READY, FAILED) for p in self.phases.values())
+
+    def report(self) -> dict:
+        return {
+            "mode": STARTUP_MODE,
+            "ready": self.ready,
+            "import_seconds": self.imports,
+            "import_total_seconds": round(sum(self.imports.values()), 4),
+            "time_to_listen_seconds": (
+                None if self.listening_at is None else round(self.listening_at - self.started, 4)
+            ),
+            "phases": self.phases,
+        }
+
+
+startup = Startup()
+
+
+if __name__ == "__main__":
+    import json
+
+    t0 = time.perf_counter()
+    import main
+
+    print(json.dumps({**main.startup.report(), "wall_seconds": round(time.perf_counter() - t0, 4)}, indent=2))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Service modules live in the directory above (run as `python -m pytest` from insurance-ai/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
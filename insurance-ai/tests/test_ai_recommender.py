@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import pytest
+
+import ai_recommender
+from catalog_store import catalog_store
+from llm_cache import llm_cache
+
+PROFILE = {"employment_type": "delivery", "avg_monthly_income": 21000, "risk_classification": "MEDIUM"}
+
+
+def test_string_match_scores_are_coerced_before_caching(monkeypatch):
+    plans = catalog_store.snapshot.index.eligible("delivery")
+
+    async def fake_groq(prompt, timeout=None, on_token=None, stage=None):
+        if stage == "rank":
+            return json.dumps([{"plan_id": p["plan_id"], "match_score": str(90 - i)} for i, p in enumerate(plans)])
+        raise RuntimeError("explanations are not under test")
+
+    monkeypatch.setattr(ai_recommender, "_call_groq", fake_groq)
+    monkeypatch.setattr(ai_recommender, "RANK_TOP_K", 2)
+    llm_cache._mem.clear()
+
+    for _ in range(2):      # the second request is served from the cache
+        results = asyncio.run(ai_recommender.get_recommendations(PROFILE, plans, top_n=3, deadline_ms=0))
+        scores = [r["match_score"] for r in results]
+        assert scores[:2] == [90, 89] and all(isinstance(s, int) for s in scores)
+    assert all(isinstance(r["match_score"], int) for value, _ in llm_cache._mem.values() for r in value
+               if isinstance(value, list))
+
+
+def test_non_numeric_match_score_is_malformed():
+    assert ai_recommender._clean_ranking([{"plan_id": "A", "match_score": "high"}]) is None
+    assert ai_recommender._clean_ranking([{"plan_id": "A", "match_score": True}]) is None
+    assert ai_recommender._clean_ranking([{"plan_id": "A", "match_score": 71.6}])[0]["match_score"] == 71
+
+
+def test_explain_mode_setting_rejects_typos(monkeypatch):
+    monkeypatch.setenv("RECOMMEND_BATCH_EXPLAIN_MODE", "bacth")
+    with pytest.raises(ValueError, match="RECOMMEND_BATCH_EXPLAIN_MODE"):
+        ai_recommender.explain_mode_setting("RECOMMEND_BATCH_EXPLAIN_MODE", "batch")
+    monkeypatch.delenv("RECOMMEND_BATCH_EXPLAIN_MODE")
+    assert ai_recommender.explain_mode_setting("RECOMMEND_BATCH_EXPLAIN_MODE", "batch") == "batch"
@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from catalog_responses import _accepts_gzip
+
+client = TestClient(main.app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("br, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("identity", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("", False),
+])
+def test_accepts_gzip_honours_q_values(header, expected):
+    assert _accepts_gzip(header) is expected
+
+
+def test_gzip_and_identity_have_distinct_etags():
+    gz = client.get("/catalog", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/catalog", headers={"Accept-Encoding": "gzip;q=0"})
+    assert gz.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert gz.headers["etag"] == plain.headers["etag"][:-1] + '-gz"'
+
+    for etag in (gz.headers["etag"], plain.headers["etag"]):
+        again = client.get("/catalog", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.headers["etag"] == plain.headers["etag"]
@@ -0,0 +1,58 @@
+import copy
+import json
+
+import pytest
+
+import catalog_store
+from catalog_store import CatalogError, CatalogStore, validate_plans
+from insurer_catalog import INSURER_CATALOG
+
+
+def _write(path, plans):
+    path.write_text(json.dumps(plans), encoding="utf-8")
+
+
+def test_missing_provider_fields_are_rejected():
+    plans = copy.deepcopy(INSURER_CATALOG)
+    del plans[0]["rating"]
+    with pytest.raises(CatalogError, match="rating"):
+        validate_plans(plans)
+
+
+def test_non_numeric_fields_are_rejected():
+    plans = copy.deepcopy(INSURER_CATALOG)
+    plans[0]["premium"]["per_day"] = "35"
+    with pytest.raises(CatalogError, match="premium.per_day"):
+        validate_plans(plans)
+
+
+def test_bad_file_falls_back_to_seed_and_reload_keeps_snapshot(tmp_path):
+    path = tmp_path / "catalog.json"
+    plans = copy.deepcopy(INSURER_CATALOG)
+    del plans[0]["provider_logo"]
+    _write(path, plans)
+    store = CatalogStore(str(path))
+    assert store.snapshot.source == "seed"
+    assert store.errors == 1
+
+    _write(path, INSURER_CATALOG[:2])
+    assert store.reload(force=True)
+    version = store.version
+    _write(path, plans)
+    assert not store.reload(force=True)
+    assert store.version == version
+
+
+def test_snapshot_build_errors_become_catalog_errors(monkeypatch):
+    store = CatalogStore("")
+    version = store.version
+
+    def broken(*args, **kwargs):
+        raise KeyError("provider_logo")
+
+    monkeypatch.setattr(catalog_store, "CatalogSnapshot", broken)
+    with pytest.raises(CatalogError):
+        store.publish(INSURER_CATALOG[:2], source="test")
+    with pytest.raises(CatalogError):
+        store.apply_diff([], {INSURER_CATALOG[0]["plan_id"]}, source="test")
+    assert store.version == version
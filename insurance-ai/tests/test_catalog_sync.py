@@ -0,0 +1,31 @@
+import asyncio
+
+from catalog_store import CatalogStore
+from catalog_sync import CatalogSync, start_stub_server
+from insurer_catalog import INSURER_CATALOG
+
+
+def test_plan_moving_between_feeds_is_not_removed():
+    a, b, moved = INSURER_CATALOG[:2], INSURER_CATALOG[2:4], INSURER_CATALOG[1]
+    server, base = start_stub_server({"a": a, "b": b})
+    store = CatalogStore("", seed=INSURER_CATALOG[:4])
+    sync = CatalogSync([f"{base}/a.json", f"{base}/b.json"], store)
+    try:
+        async def run():
+            await sync.sync_once()
+            server.set_feed("a", a[:1])
+            server.set_feed("b", [*b, moved])
+            counts = await sync.sync_once()
+            assert counts == {"added": 0, "updated": 0, "removed": 0}
+            assert moved["plan_id"] in store.snapshot.by_id
+
+            server.set_feed("b", b)             # now gone from every feed
+            counts = await sync.sync_once()
+            assert counts["removed"] == 1
+            assert moved["plan_id"] not in store.snapshot.by_id
+            await sync.close()
+
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+    assert store.reloads == 1
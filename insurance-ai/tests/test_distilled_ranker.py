@@ -0,0 +1,39 @@
+import numpy as np
+
+from distilled_ranker import FEATURE_NAMES, DistilledRanker
+from insurer_catalog import INSURER_CATALOG
+
+PROFILE = {"employment_type": "delivery", "avg_monthly_income": 18000, "risk_classification": "MEDIUM"}
+
+
+def _ranker(preds: list) -> DistilledRanker:
+    n = len(FEATURE_NAMES)
+    ranker = DistilledRanker(np.zeros(n), np.ones(n), np.zeros((len(preds), n)), np.zeros(len(preds)), {})
+    ranker.predict_matrix = lambda X: np.array(preds, dtype=float)
+    return ranker
+
+
+def test_confidence_is_order_aware_with_few_plans():
+    # Every member picks the same three plans; one orders them differently
+    ranker = _ranker([[90, 80, 70], [90, 70, 80], [90, 80, 70]])
+    _, confidence = ranker.score(PROFILE, INSURER_CATALOG[:3], top_n=3)
+    assert confidence == 2 / 3
+
+
+def test_confidence_covers_only_the_returned_plans():
+    ranker = _ranker([[90, 60, 50, 40], [90, 50, 60, 40], [90, 60, 50, 40]])
+    plans = INSURER_CATALOG[:4]
+    assert ranker.score(PROFILE, plans, top_n=1)[1] == 1.0
+    assert ranker.score(PROFILE, plans, top_n=2)[1] == 2 / 3
+    assert ranker.score(PROFILE, plans, top_n=0)[1] == 1.0     # still judged on the top-1
+
+
+def test_plan_row_cache_is_bounded(monkeypatch):
+    import distilled_ranker
+
+    monkeypatch.setattr(distilled_ranker, "PLAN_ROW_CACHE_SIZE", 4)
+    ranker = _ranker([[90, 60]])
+    plans = INSURER_CATALOG[:2]
+    for version in range(10):
+        ranker.score(PROFILE, plans, [(p["plan_id"], f"v{version}") for p in plans])
+    assert list(ranker._plan_rows) == [(p["plan_id"], f"v{v}") for v in (8, 9) for p in plans]
@@ -0,0 +1,78 @@
+import random
+
+from income_engine import columns_from_profiles, predict_incomes
+from main import GigWorkerIncomeData
+
+
+def _reference_loop(profiles: list, rng: random.Random) -> list:
+    """The per-profile /predict_income loop the vectorized engine replaced."""
+    results = []
+    for profile in profiles:
+        explicit_calc = (profile.base_pay_total + profile.tips_total +
+                         profile.bonus_earned + profile.surge_earnings +
+                         profile.incentives_received - profile.deductions)
+        if explicit_calc > 1000:
+            anchor = explicit_calc
+        else:
+            hourly_rate = 100
+            if profile.vehicle_type == "car":
+                hourly_rate += 50
+            elif profile.vehicle_type == "bike":
+                hourly_rate += 30
+            if profile.skill_level == "expert":
+                hourly_rate += 40
+            elif profile.skill_level == "intermediate":
+                hourly_rate += 20
+            hourly_rate += (profile.years_of_experience * 5)
+            anchor = profile.total_hours_worked_month * hourly_rate
+
+        perf_mult = 1.0
+        perf_mult += (profile.acceptance_rate - 0.8) * 0.5
+        perf_mult -= (profile.cancellation_rate) * 1.0
+        perf_mult += (profile.avg_rating - 4.5) * 0.1
+        if profile.platform_level in ["diamond", "platinum"]:
+            perf_mult += 0.15
+        elif profile.platform_level == "gold":
+            perf_mult += 0.10
+        perf_mult *= max(0.5, profile.demand_index)
+        expected_income = anchor * max(0.6, perf_mult)
+
+        jitter = rng.uniform(-0.05, 0.08)
+        final_income = expected_income * (1 + jitter)
+        min_income = max(3000, profile.total_hours_worked_month * 40)
+        results.append(round(max(min_income, final_income), 2))
+    return results
+
+
+def _profiles(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(n):
+        # About half the rows fall below the explicit-earnings anchor threshold
+        explicit = rng.random() < 0.5
+        money = (lambda: rng.uniform(0, 20000)) if explicit else (lambda: rng.uniform(0, 150))
+        profiles.append(GigWorkerIncomeData(
+            vehicle_type=rng.choice(["car", "bike", "scooter", "cycle"]),
+            skill_level=rng.choice(["expert", "intermediate", "beginner"]),
+            platform_level=rng.choice(["diamond", "platinum", "gold", "silver", "bronze"]),
+            years_of_experience=rng.choice([0, 1, 2.5, rng.uniform(0, 15)]),
+            total_hours_worked_month=rng.uniform(0, 320),
+            acceptance_rate=rng.random(),
+            cancellation_rate=rng.uniform(0, 0.5),
+            avg_rating=rng.uniform(1, 5),
+            demand_index=rng.uniform(-0.5, 2),
+            base_pay_total=money(),
+            tips_total=money(),
+            bonus_earned=money(),
+            surge_earnings=money(),
+            incentives_received=money(),
+            deductions=money(),
+        ))
+    return profiles
+
+
+def test_vectorized_engine_matches_reference_loop():
+    for seed in range(4):
+        profiles = _profiles(5000, seed)
+        expected = _reference_loop(profiles, random.Random(seed))
+        assert predict_incomes(columns_from_profiles(profiles), random.Random(seed)) == expected
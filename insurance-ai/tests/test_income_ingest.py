@@ -0,0 +1,57 @@
+import csv
+import io
+import random
+
+import numpy as np
+import pytest
+
+from income_ingest import ColumnError, _parse_csv_rows, parse_csv, validate_columns
+from main import INCOME_SCHEMA
+
+NAMES = ["platform", "city", "total_hours_worked_month", "base_pay_total", "avg_rating", "age"]
+
+
+def _csv(rows: list) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(NAMES)
+    writer.writerows(rows)
+    return buf.getvalue().encode()
+
+
+def test_typed_csv_matches_row_by_row_parsing():
+    rng = random.Random(3)
+    rows = [
+        [
+            rng.choice(["Swiggy", "Uber, Eats", 'Ola "Pro"', "#1 Fleet"]),
+            rng.choice(["Mumbai", "Delhi"]),
+            repr(rng.uniform(0, 744)),
+            repr(rng.uniform(0, 1e5) * 10 ** rng.randint(-6, 0)),
+            f"{rng.uniform(0, 5):.3f}",
+            str(rng.randint(18, 70)),
+        ]
+        for _ in range(2000)
+    ]
+    body = _csv(rows)
+    typed = parse_csv(body, INCOME_SCHEMA)
+    assert typed["total_hours_worked_month"].dtype == np.float64
+    expected = validate_columns(_parse_csv_rows(body.decode()), INCOME_SCHEMA)
+    actual = validate_columns(typed, INCOME_SCHEMA)
+    for name in expected:
+        assert np.array_equal(actual[name], expected[name]), name
+
+
+@pytest.mark.parametrize("rows, message", [
+    ([["Swiggy", "Pune", "170", "22000", "4.5", "30"], ["Uber", "Pune", "160"]], "row 1: expected 6 values, got 3"),
+    ([["Swiggy", "Pune", "170", "n/a", "4.5", "30"]], "column 'base_pay_total' row 0: 'n/a' is not a number"),
+    ([["Swiggy", "Pune", "170", "", "4.5", "30"]], "column 'base_pay_total' row 0: '' is not a number"),
+    ([["Swiggy", "Pune", "170", "22000", "4.5", "30.5"]], "column 'age' row 0: 30.5 is not an integer"),
+])
+def test_malformed_csv_reports_the_row(rows, message):
+    with pytest.raises(ColumnError, match=message):
+        validate_columns(parse_csv(_csv(rows), INCOME_SCHEMA), INCOME_SCHEMA)
+
+
+def test_header_only_csv_gives_empty_columns():
+    cols = validate_columns(parse_csv(_csv([]), INCOME_SCHEMA), INCOME_SCHEMA)
+    assert len(cols["age"]) == 0
@@ -0,0 +1,50 @@
+import random
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from income_engine import columns_from_profiles
+from income_model import IncomeModel, model_columns_from_profiles, predict_with_engine
+from main import INCOME_NUMERIC_FIELDS, GigWorkerIncomeData
+
+
+def _profiles(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        GigWorkerIncomeData(
+            platform=rng.choice(["Swiggy", "Zomato", "Uber", "Ola"]),
+            platform_level=rng.choice(["bronze", "silver", "gold"]),
+            city=rng.choice(["Mumbai", "Delhi", "Pune"]),
+            vehicle_type=rng.choice(["bike", "car", "scooter"]),
+            platform_hours_ratio=rng.uniform(0.2, 0.9),
+            total_hours_worked_month=rng.uniform(60, 260),
+            base_pay_total=rng.uniform(5000, 40000),
+            avg_rating=rng.uniform(3.5, 5.0),
+        )
+        for _ in range(n)
+    ]
+
+
+def test_dummies_model_matches_sklearn_predict():
+    profiles = _profiles(200)
+    frame = pd.get_dummies(pd.DataFrame([p.model_dump() for p in profiles]), dtype=float)
+    y = np.random.default_rng(1).normal(20000, 5000, len(frame))
+    est = LinearRegression().fit(frame, y)
+
+    model = IncomeModel(est, INCOME_NUMERIC_FIELDS)
+    assert ("numeric", "platform_hours_ratio") in model.plan
+    assert ("onehot", "platform_level", "gold") in model.plan
+
+    cols = model_columns_from_profiles(profiles, model)
+    results, engines = predict_with_engine(cols, None, "model", model)
+    assert engines == ["model"] * len(profiles)
+    np.testing.assert_allclose(results, np.round(est.predict(frame), 2), atol=0.011)
+
+
+
+def test_missing_model_labels_rows_heuristic():
+    profiles = _profiles(5)
+    results, engines = predict_with_engine(columns_from_profiles(profiles), None, "model", None)
+    assert len(results) == 5
+    assert engines == ["heuristic"] * 5
@@ -0,0 +1,23 @@
+import asyncio
+import threading
+
+from llm_cache import LLMCache
+
+
+def test_async_sqlite_tier_runs_off_the_event_loop(tmp_path):
+    cache = LLMCache(1, 60, str(tmp_path / "cache.sqlite3"))
+    threads = set()
+    db_get, db_put = cache._db_get, cache._db_put
+    cache._db_get = lambda *a: threads.add(threading.get_ident()) or db_get(*a)
+    cache._db_put = lambda *a: threads.add(threading.get_ident()) or db_put(*a)
+
+    async def run():
+        await cache.aset("a", {"rank": 1})
+        await cache.aset("b", {"rank": 2})          # evicts "a" from memory
+        return await cache.aget_many(["a", "b", "missing"])
+
+    assert asyncio.run(run()) == [{"rank": 1}, {"rank": 2}, None]
+    assert threading.get_ident() not in threads
+    assert cache.counters["sqlite_hits"] == 1
+    assert cache.counters["memory_hits"] == 1
+    assert cache.counters["misses"] == 1
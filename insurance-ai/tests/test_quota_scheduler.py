@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+
+from quota_scheduler import QuotaScheduler, QuotaUsage
+from rate_limiter import TokenBucket
+
+
+def _scheduler(tmp_path, rate: float = 1000, capacity: int = 1) -> QuotaScheduler:
+    return QuotaScheduler(TokenBucket(rate, capacity), QuotaUsage(str(tmp_path / "quota.sqlite3")), daily_quota=100)
+
+
+def test_usage_is_persisted_off_the_event_loop(tmp_path):
+    scheduler = _scheduler(tmp_path, capacity=5)
+    threads = set()
+    record = scheduler.usage.record
+    scheduler.usage.record = lambda: threads.add(threading.get_ident()) or record()
+
+    async def run():
+        await asyncio.gather(*(scheduler.acquire() for _ in range(3)))
+        assert scheduler.usage.today == 3
+        await asyncio.gather(*scheduler._writes)
+
+    asyncio.run(run())
+    assert threads and threading.get_ident() not in threads
+    assert QuotaUsage(str(tmp_path / "quota.sqlite3")).today == 3
+
+
+def test_failed_grant_resolves_the_waiter_and_keeps_dispatching(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    add, failures = scheduler.usage.add, [RuntimeError("database is locked")]
+
+    def flaky_add():
+        if failures:
+            raise failures.pop()
+        add()
+
+    async def run():
+        await scheduler.acquire()                      # takes the only token
+        scheduler.usage.add = flaky_add
+        first = asyncio.create_task(scheduler.acquire(priority="background"))
+        second = asyncio.create_task(scheduler.acquire(priority="background"))
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(first, 5)
+        await asyncio.wait_for(second, 5)
+        await asyncio.gather(*scheduler._writes)
+
+    asyncio.run(run())
+    assert scheduler.usage.today == 2
+
+
+def test_minute_limit_is_shared_between_processes(tmp_path):
+    db = str(tmp_path / "quota.sqlite3")
+    service = QuotaScheduler(TokenBucket(1000, 10), QuotaUsage(db), daily_quota=100, per_minute=3)
+    job = QuotaScheduler(TokenBucket(1000, 10), QuotaUsage(db), daily_quota=100, per_minute=3)
+    assert job._delay() == 0
+
+    async def run():
+        for _ in range(3):
+            await service.acquire()
+        await asyncio.gather(*service._writes)
+
+    asyncio.run(run())
+    job.usage._minute_read_at = float("-inf")       # as if MINUTE_REFRESH had passed
+    assert job._delay() > 0
@@ -0,0 +1,75 @@
+import copy
+import random
+
+import numpy as np
+
+from insurer_catalog import INSURER_CATALOG
+from ranking_engine import CompiledCatalog, score_profiles, top_n_indices
+
+
+def _reference_scores(profile: dict, plans: list) -> list:
+    """The per-plan rule loop that score_profiles replaced."""
+    emp = profile.get("employment_type", "delivery")
+    income = profile.get("avg_monthly_income", 15000)
+    risk = profile.get("risk_classification", "MEDIUM")
+    scores = []
+    for p in plans:
+        score = 50
+        if emp in p.get("target_workers", []):
+            score += 20
+        daily = p["premium"]["per_day"]
+        daily_income = income / 30
+        if daily / daily_income < 0.002:
+            score += 15
+        elif daily / daily_income < 0.004:
+            score += 8
+        if risk == "HIGH" and p["coverage_amount"] >= 300000:
+            score += 10
+        elif risk == "LOW" and p["premium"]["per_day"] <= 20:
+            score += 10
+        scores.append(min(score, 99))
+    return scores
+
+
+def _reference_top(scores: list, n: int) -> list:
+    return [i for i, _ in sorted(enumerate(scores), key=lambda x: x[1], reverse=True)[:n]]
+
+
+def _profile(rng: random.Random) -> dict:
+    profile = {
+        "employment_type": rng.choice(["delivery", "driver", "freelancer", "domestic"]),
+        "risk_classification": rng.choice(["LOW", "MEDIUM", "HIGH"]),
+        # Spans every premium/income band, including the exact band edges
+        "avg_monthly_income": rng.choice([rng.uniform(1000, 500000), 35 * 30 / 0.002, 15000]),
+    }
+    for field in ("employment_type", "risk_classification", "avg_monthly_income"):
+        if rng.random() < 0.1:
+            del profile[field]
+    return profile
+
+
+def test_scores_and_top_n_match_reference_loop():
+    rng = random.Random(0)
+    compiled = CompiledCatalog(INSURER_CATALOG)
+    for _ in range(300):
+        plans = rng.sample(INSURER_CATALOG, rng.randint(1, len(INSURER_CATALOG)))
+        profiles = [_profile(rng) for _ in range(20)]
+        scores = score_profiles(compiled, profiles, compiled.positions(plans))
+        for profile, row in zip(profiles, scores):
+            expected = _reference_scores(profile, plans)
+            assert row.tolist() == expected
+            n = rng.randint(0, len(plans) + 1)
+            assert top_n_indices(row, n).tolist() == _reference_top(expected, n)
+
+
+def test_ad_hoc_plan_lists_match_reference_loop():
+    rng = random.Random(1)
+    for _ in range(100):
+        plans = copy.deepcopy(rng.sample(INSURER_CATALOG, rng.randint(1, len(INSURER_CATALOG))))
+        for p in plans:
+            p["premium"]["per_day"] = rng.choice([p["premium"]["per_day"], rng.uniform(1, 60), 20])
+            p["coverage_amount"] = rng.choice([p["coverage_amount"], 300000, rng.randint(10000, 1000000)])
+        profiles = [_profile(rng) for _ in range(20)]
+        scores = score_profiles(CompiledCatalog(plans), profiles)
+        assert scores.tolist() == [_reference_scores(p, plans) for p in profiles]
+        assert np.all(scores <= 99)
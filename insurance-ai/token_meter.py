@@ -0,0 +1,43 @@
+"""
+Token Meter
+Prompt / completion token counts per pipeline stage.
+
+Counts come from the provider's `usage` block. Streamed completions that do
+not report usage are estimated at ~4 characters per token and counted
+separately as `estimated_calls`.
+"""
+
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+class TokenMeter:
+    def __init__(self):
+        self.stages: dict = {}
+
+    def record(self, stage: str, prompt_tokens: int, completion_tokens: int, estimated: bool = False):
+        s = self.stages.setdefault(
+            stage, {"calls": 0, "estimated_calls": 0, "prompt_tokens": 0, "completion_tokens": 0},
+        )
+        s["calls"] += 1
+        s["estimated_calls"] += int(estimated)
+        s["prompt_tokens"] += prompt_tokens
+        s["completion_tokens"] += completion_tokens
+
+    def stats(self) -> dict:
+        out = {}
+        for stage, s in sorted(self.stages.items()):
+            out[stage] = {
+                **s,
+                "avg_prompt_tokens": round(s["prompt_tokens"] / s["calls"], 1),
+                "avg_completion_tokens": round(s["completion_tokens"] / s["calls"], 1),
+            }
+        total_prompt = sum(s["prompt_tokens"] for s in self.stages.values())
+        total_completion = sum(s["completion_tokens"] for s in self.stages.values())
+        return {"stages": out, "prompt_tokens": total_prompt, "completion_tokens": total_completion}
+
+
+llm_tokens = TokenMeter()